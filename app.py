@@ -1,88 +1,121 @@
 from flask import Flask, render_template, Response, request, jsonify
 import cv2
-import face_recognition
-import pickle
 import os
-import pandas as pd
-import sqlite3
 from datetime import datetime, timedelta
 import ollama  # Import Ollama to call the chatbot
-import numpy as np 
 import json
+import threading
 import random
 import time
 import pytz
 from tzlocal import get_localzone
 from apscheduler.schedulers.background import BackgroundScheduler
+from face_gallery import FaceGallery
+from face_memory import FaceMemoryStore, write_json_atomic
+from encoding_store import EncodingStore
+from cameras import CameraPipeline, DetectionScheduler
+from video_stream import DEFAULT_PROFILE, STREAM_PROFILES
+from visits import VisitSessionizer
+import visit_rollups
+from db import Database
+from migrations import migrate
+from reminder_engine import ReminderDayCache, ReminderEngine, next_due_after_completion, next_occurrence
+from events import EventBus
+from enrollment import EnrollmentQueue
+from frame_quality import pick_best_frame
+from people import PeopleRegistry
+from retention import FileStore, JsonListStore, RetentionService, TableStore
 
 # Memory file paths
 MEMORY_FOLDER = "memory"
 CHAT_MEMORY_FILE = os.path.join(MEMORY_FOLDER, "chat_memory.json")
 FACE_MEMORY_FILE = os.path.join(MEMORY_FOLDER, "recognized_faces.json")
 DAILY_ROUTINES_FILE = os.path.join(MEMORY_FOLDER, "daily_routines.json")
+FACE_MEMORY_WRITE_INTERVAL = 2.0  # Seconds; bursts of last_seen changes are coalesced into one write
 
 # Database and other file paths
 KNOWN_FACES_DIR = "known_faces"
-ENCODINGS_FILE = "face_encodings.pkl"
+UNKNOWN_FACES_DIR = "unknown_faces"
+CAPTURES_DIR = "temp_captures"  # /capture_person photos until they are enrolled
+ENCODINGS_FILE = "face_encodings.pkl"  # Legacy format, migrated into ENCODING_STORE_DIR on first start
+ENCODING_STORE_DIR = "face_store"
 CSV_FILE = "people_data.csv"
 DB_FILE = "patient_database.db"  # SQLite Database
 
+# Face matching index: "exact", "cluster" (k-means partitions) or "int8"/"float16" (quantized)
+FACE_INDEX_TYPE = "exact"
+
+# Enrollment (/add_person): photos are encoded in the background by this many processes.
+# "multi" keeps one embedding per photo, "centroid" stores their mean.
+ENROLLMENT_WORKERS = 2
+ENROLLMENT_MODE = "multi"
+RECENT_FRAMES = 12  # Raw frames kept per camera for /capture_person to choose from
+CAPTURE_BURST_FRAMES = 6  # Frames read for /capture_person when the stream isn't running
+
+# Face detection gating
+DETECTION_MODE = "gated"  # "gated" = detect on motion/every N frames and track between, "every_frame" = always detect
+MOTION_THRESHOLD = 0.02  # Fraction of changed pixels that triggers a full detection
+DETECT_EVERY_N_FRAMES = 15  # Full detection at least this often, even without motion
+TARGET_FPS = 10.0  # Per-frame latency budget; detection downscale/upsampling adapts to hold it
+IDENTITY_REVERIFY_FRAMES = 45  # Re-encode a tracked, already recognized face at least this often
+IDENTITY_MIN_MARGIN = 0.08  # Matches closer than this to the tolerance are re-encoded on every detection
+
+# Recognition workers: 0 = detect in the capture thread, N = N worker processes (per camera)
+RECOGNITION_WORKERS = 0
+MAX_FRAMES_IN_FLIGHT = 4  # Frames captured but not yet finished (with the workers or waiting to be drawn)
+
+# Cameras: name -> OpenCV source (device index or stream URL), scheduling priority and
+# optional per-camera "workers". The first camera is the primary one used by the chatbot.
+CAMERA_SOURCES = {
+    "default": {"source": 0, "priority": 1},
+    # "front_door": {"source": "rtsp://192.168.1.20/stream", "priority": 3},
+    # "living_room": {"source": 1, "priority": 2},
+}
+MAX_DETECTIONS_PER_SECOND = 10.0  # Full detections shared across all cameras by priority and motion
+
+# Visit tracking
+VISIT_ABSENCE_TIMEOUT = 120  # Seconds out of view before a visit is closed
+VISIT_FLUSH_INTERVAL = 15  # Seconds between batched visit writes to the database
+ABSENT_AFTER_DAYS = 14  # Default window for "who hasn't visited"
+
+# Reminders fire at their due time (minus this lead) from an in-process heap
+REMINDER_LEAD_SECONDS = 0
+
+# Server-sent events (/events)
+EVENT_HISTORY = 256  # Events kept so a reconnecting browser can resume by Last-Event-ID
+
+# Web server threads (serve.py). Waitress holds one thread per open response for as long as it
+# streams, so every open page pins one for /events plus one per camera it shows on /video_feed;
+# size the pool for the browsers expected at once and leave spare threads for ordinary requests.
+MAX_BROWSERS = 4
+SPARE_SERVER_THREADS = 4
+SERVER_THREADS = MAX_BROWSERS * (1 + len(CAMERA_SOURCES)) + SPARE_SERVER_THREADS
+
+# Retention (retention.py): limits per store; max_age is in seconds and a missing limit doesn't apply
+RETENTION_POLICIES = {
+    "captures": {"max_age": 7 * 86400, "max_count": 500, "max_bytes": 500 * 2**20},
+    "unknown_faces": {"max_age": 30 * 86400, "max_count": 2000, "max_bytes": 1024 * 2**20},
+    "visit_history": {"max_age": 365 * 86400, "max_count": 200000},  # Rollups keep the counts
+    "chat_memory": {"max_count": 1000, "max_bytes": 2 * 2**20},
+}
+RETENTION_INTERVAL_MINUTES = 30
+RETENTION_MAX_DELETES = 500  # Per run; a larger backlog is worked off over several runs
+RETENTION_DELETES_PER_SECOND = 50
+RETENTION_VACUUM_HOUR = 3  # Local hour of the nightly full-VACUUM check
+
 # Initialize scheduler
 scheduler = BackgroundScheduler()
 scheduler.start()
 
+# Pooled SQLite connections (WAL mode) shared by routes, the scheduler and background writers
+db = Database(DB_FILE)
+
 def init_db():
-    """Initialize the database with required tables."""
-    conn = sqlite3.connect(DB_FILE)
+    """Bring the database up to the current schema (see migrations.py) and seed the default patient."""
+    conn = db.connect()
+    migrate(conn)
     cursor = conn.cursor()
     
-    # Create reminders table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS reminders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            due_time DATETIME NOT NULL,
-            category TEXT DEFAULT 'general',
-            is_completed INTEGER DEFAULT 0,
-            is_recurring INTEGER DEFAULT 0,
-            recurrence_pattern TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create patient_info table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS patient_info (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            age INTEGER,
-            medical_history TEXT,
-            last_doctor_visit DATE,
-            next_medication_time TIME,
-            family_members TEXT
-        )
-    ''')
-    
-    # Create known_people table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS known_people (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            relation TEXT,
-            last_visit DATETIME
-        )
-    ''')
-    
-    # Create visit_history table if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS visit_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        person_name TEXT NOT NULL,
-        visit_date DATETIME NOT NULL
-    )
-    ''')
-    
     # Insert default patient if not exists
     cursor.execute('SELECT id FROM patient_info WHERE id=1')
     if not cursor.fetchone():
@@ -96,7 +129,7 @@ def init_db():
 
 def check_upcoming_reminders():
     """Check for upcoming reminders and return notifications"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = db.connect()
     cursor = conn.cursor()
     
     # Get current time
@@ -133,7 +166,7 @@ def check_upcoming_reminders():
 def add_reminder(title, description, due_time, category, is_recurring=False, recurrence_pattern=None):
     """Add a new reminder to the database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Ensure description is not None and properly formatted
@@ -149,8 +182,12 @@ def add_reminder(title, description, due_time, category, is_recurring=False, rec
         INSERT INTO reminders (title, description, due_time, category, is_recurring, recurrence_pattern)
         VALUES (?, ?, ?, ?, ?, ?)
         ''', (title, description, due_time, category, is_recurring, recurrence_pattern))
+        reminder_id = cursor.lastrowid
         
         conn.commit()
+        reminder_days.invalidate(due_time)
+        reminder_engine.add({"id": reminder_id, "title": title, "description": description, "due_time": due_time,
+                             "category": category, "recurrence_pattern": recurrence_pattern if is_recurring else None})
         print(f"Successfully added reminder: {title} with description: {description}")
         
         # Verify the reminder was added correctly
@@ -161,6 +198,7 @@ def add_reminder(title, description, due_time, category, is_recurring=False, rec
         ''', (title, due_time))
         added_reminder = cursor.fetchone()
         print(f"Verified added reminder: {added_reminder}")
+        return reminder_id
         
     except Exception as e:
         print(f"Error adding reminder: {e}")
@@ -170,38 +208,153 @@ def add_reminder(title, description, due_time, category, is_recurring=False, rec
             conn.close()
 
 def get_todays_reminders(for_tomorrow=False):
-    """Get all reminders for today or tomorrow"""
+    """Get all reminders for today or tomorrow (served from the per-day cache)"""
+    target_date = (datetime.now() + timedelta(days=1)).date() if for_tomorrow else datetime.now().date()
+    return reminder_days.get(target_date)
+
+REMINDER_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M")
+REMINDER_FIELDS = ("title", "description", "due_time", "category", "is_recurring", "recurrence_pattern")
+
+def normalize_due_time(value):
+    """Return due_time as 'YYYY-MM-DD HH:MM:SS', or None if it can't be parsed."""
+    for fmt in REMINDER_TIME_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    return None
+
+def normalize_reminder(item, partial=False):
+    """Validate one reminder from a bulk request; returns (fields, error).
+
+    With partial=True (updates) only the fields present are returned.
+    """
+    if not isinstance(item, dict):
+        return None, "Each reminder must be an object"
+    fields = {}
+    if 'title' in item or not partial:
+        title = str(item.get('title') or '').strip()
+        if not title:
+            return None, "Title is required"
+        fields['title'] = title
+    if 'due_time' in item or not partial:
+        due_time = normalize_due_time(item.get('due_time', ''))
+        if due_time is None:
+            return None, f"Invalid due time: {item.get('due_time')!r}"
+        fields['due_time'] = due_time
+    if 'description' in item or not partial:
+        fields['description'] = str(item.get('description') or '').strip()
+    if 'category' in item or not partial:
+        fields['category'] = str(item.get('category') or 'general').strip()
+    if 'is_recurring' in item or not partial:
+        fields['is_recurring'] = 1 if item.get('is_recurring') else 0
+    if 'recurrence_pattern' in item or not partial:
+        fields['recurrence_pattern'] = item.get('recurrence_pattern') or None
+    if fields.get('is_recurring') and fields.get('recurrence_pattern') and \
+            next_occurrence(datetime.now(), fields['recurrence_pattern']) is None:
+        return None, f"Unknown recurrence pattern: {fields['recurrence_pattern']!r}"
+    return fields, None
+
+def as_engine_reminder(reminder_id, fields):
+    return {"id": reminder_id, "title": fields["title"], "description": fields["description"],
+            "due_time": fields["due_time"], "category": fields["category"],
+            "recurrence_pattern": fields["recurrence_pattern"] if fields["is_recurring"] else None,
+            "anchor_day": fields.get("recurrence_anchor")}
+
+def add_reminders(reminders):
+    """Insert many reminders in one transaction; returns their new ids in order."""
+    if not reminders:
+        return []
+    conn = db.connect()
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Get target date
-        target_date = (datetime.now() + timedelta(days=1)).date() if for_tomorrow else datetime.now().date()
-        
-        # Format the date for SQLite
-        date_str = target_date.strftime('%Y-%m-%d')
-        
-        cursor.execute('''
-        SELECT title, description, due_time, category
-        FROM reminders
-        WHERE date(due_time) = ?
-        AND is_completed = 0
-        ORDER BY due_time
-        ''', (date_str,))
-        
-        reminders = cursor.fetchall()
-        return reminders
-    except Exception as e:
-        print(f"Error in get_todays_reminders: {str(e)}")
-        raise
+        conn.execute("BEGIN IMMEDIATE")  # Holds the write lock, so the new ids are consecutive
+        conn.executemany('''
+            INSERT INTO reminders (title, description, due_time, category, is_recurring, recurrence_pattern)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [tuple(reminder[field] for field in REMINDER_FIELDS) for reminder in reminders])
+        last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reminders'").fetchone()[0]
+        conn.commit()
     finally:
-        if 'conn' in locals():
-            conn.close()
+        conn.close()
+
+    ids = list(range(last_id - len(reminders) + 1, last_id + 1))
+    reminder_days.invalidate(*[reminder['due_time'] for reminder in reminders])
+    for reminder_id, reminder in zip(ids, reminders):
+        reminder_engine.add(as_engine_reminder(reminder_id, reminder))
+    return ids
+
+def fetch_reminders(conn, ids):
+    """id -> dict of REMINDER_FIELDS (and recurrence_anchor) for the open reminders among ids."""
+    rows = conn.execute(f'''
+        SELECT id, recurrence_anchor, {", ".join(REMINDER_FIELDS)} FROM reminders
+        WHERE is_completed = 0 AND id IN ({", ".join("?" * len(ids))})
+    ''', list(ids)).fetchall()
+    return {row[0]: dict(zip(REMINDER_FIELDS, row[2:]), recurrence_anchor=row[1]) for row in rows}
+
+def update_reminders(changes):
+    """Apply {id: changed fields} in one transaction; returns the ids that were found and updated."""
+    if not changes:
+        return []
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        current = fetch_reminders(conn, list(changes))
+        updated = {reminder_id: dict(current[reminder_id], **fields)
+                   for reminder_id, fields in changes.items() if reminder_id in current}
+        for reminder_id, fields in updated.items():
+            if fields['due_time'] != current[reminder_id]['due_time']:
+                fields['recurrence_anchor'] = None  # A new due time sets a new day of the month
+        conn.executemany(f'''
+            UPDATE reminders SET {", ".join(f"{field} = ?" for field in REMINDER_FIELDS)}, recurrence_anchor = ?
+            WHERE id = ?
+        ''', [tuple(fields[field] for field in REMINDER_FIELDS) + (fields['recurrence_anchor'], reminder_id)
+              for reminder_id, fields in updated.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+    for reminder_id, fields in updated.items():
+        reminder_days.invalidate(current[reminder_id]['due_time'], fields['due_time'])
+        reminder_engine.update(as_engine_reminder(reminder_id, fields))
+    return list(updated)
+
+def complete_reminders(ids):
+    """Complete many reminders in one transaction; recurring ones move on to their next occurrence.
+
+    Returns {id: next due time or None} for the ids that were open.
+    """
+    if not ids:
+        return {}
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        current = fetch_reminders(conn, ids)
+        next_due = {reminder_id: next_due_after_completion(
+                        reminder['due_time'], reminder['recurrence_pattern'] if reminder['is_recurring'] else None,
+                        anchor_day=reminder['recurrence_anchor'])
+                    for reminder_id, reminder in current.items()}
+        # Monthly reminders keep the day they were set for, even after a shorter month clamped it
+        conn.executemany("UPDATE reminders SET due_time = ?, recurrence_anchor = ? WHERE id = ?",
+                         [(due.strftime('%Y-%m-%d %H:%M:%S'),
+                           current[reminder_id]['recurrence_anchor'] or int(current[reminder_id]['due_time'][8:10]),
+                           reminder_id)
+                          for reminder_id, due in next_due.items() if due is not None])
+        conn.executemany("UPDATE reminders SET is_completed = 1 WHERE id = ?",
+                         [(reminder_id,) for reminder_id, due in next_due.items() if due is None])
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Only once the rows are committed, so a failed write leaves the engine as it was
+    for reminder_id, due in next_due.items():
+        reminder_engine.complete(reminder_id, due)
+    reminder_days.invalidate(*[reminder['due_time'] for reminder in current.values()], *next_due.values())
+    return next_due
 
 def add_test_reminder():
     """Add a test reminder to the database."""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Add a test reminder for today
@@ -231,8 +384,18 @@ init_db()
 # Remove the add_test_reminder() call
 # add_test_reminder()  # Commented out to prevent test reminder creation
 
-# Start reminder checking job (checks every 5 minutes)
-scheduler.add_job(check_upcoming_reminders, 'interval', minutes=5)
+# Browsers subscribe to /events for recognized names and due reminders
+event_bus = EventBus(EVENT_HISTORY)
+
+def format_upcoming(reminder):
+    return {"id": reminder[0], "title": reminder[1], "description": reminder[2],
+            "due_time": reminder[3], "category": reminder[4]}
+
+# Push every reminder to the browsers the moment it is due; day lists are cached until a write touches them
+reminder_days = ReminderDayCache(db)
+reminder_engine = ReminderEngine(db, on_due=lambda reminder: event_bus.publish("reminder", reminder),
+                                 lead=timedelta(seconds=REMINDER_LEAD_SECONDS), day_cache=reminder_days)
+reminder_engine.start()
 
 # Ensure memory folder exists
 os.makedirs(MEMORY_FOLDER, exist_ok=True)
@@ -256,36 +419,29 @@ def save_memory(file_path, data):
 
 app = Flask(__name__)
 
-# Load the database (CSV) containing people details
-if os.path.exists(CSV_FILE):
-    people_df = pd.read_csv(CSV_FILE)
-    people_df["Name"] = people_df["Name"].str.strip()  # Remove extra spaces
-else:
-    people_df = pd.DataFrame(columns=["Name", "Relation", "Age", "Medical_History", "Last_Visit", "Notes"])
-
-# Load known faces
-if os.path.exists(ENCODINGS_FILE):
-    try:
-        with open(ENCODINGS_FILE, "rb") as f:
-            data = pickle.load(f)
-            known_encodings, known_names = data.get("encodings", []), data.get("names", [])
-            known_names = [name.strip() for name in known_names]  # Ensure names are clean
-            print(f"Loaded {len(known_encodings)} encodings.")
-            print(f"Known Names: {set(known_names)}")
-    except Exception as e:
-        print(f"Error loading encodings: {e}")
-        known_encodings, known_names = [], []
-else:
+# Load known faces from the memory-mapped encoding store, migrating the legacy pickle once
+encoding_store = EncodingStore(ENCODING_STORE_DIR)
+try:
+    if not encoding_store.exists() and os.path.exists(ENCODINGS_FILE):
+        encoding_store.migrate_from_pickle(ENCODINGS_FILE)
+    known_encodings, known_names = encoding_store.load()
+    print(f"Loaded {len(known_encodings)} encodings.")
+    print(f"Known Names: {set(known_names)}")
+except Exception as e:
+    print(f"Error loading encodings: {e}")
     known_encodings, known_names = [], []
 
-# Initialize webcam
-video_capture = cv2.VideoCapture(0)
+# Gallery used for matching; built once at startup and updated in place by add_person
+face_gallery = FaceGallery(known_encodings, known_names, tolerance=0.5, index=FACE_INDEX_TYPE)
+
+# Everyone's details (CSV, known_people, gallery names) in one dict keyed by normalized name
+people = PeopleRegistry(db, CSV_FILE).load(known_names)
 
-recognized_name = "Unknown"  # Global variable to store recognized name
+recognized_name = "Unknown"  # Name seen by the primary camera
 
 def save_person_visit(name, relation="Unknown"):
     """Save a person's visit in the database"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = db.connect()
     cursor = conn.cursor()
 
     # Get today's date
@@ -305,50 +461,62 @@ def save_person_visit(name, relation="Unknown"):
 
     # Insert into visit history
     cursor.execute("INSERT INTO visit_history (person_name, visit_date) VALUES (?, ?)", (name, visit_date))
+    visit_rollups.record(conn, [(name, visit_date, None)])
 
     conn.commit()
     conn.close()
 
-def generate_frames():
-    """Capture frames, perform face recognition, and store in memory."""
+def on_camera_recognized(camera, name):
+    """Record a camera's new recognized name in memory; the primary camera also drives recognized_name."""
     global recognized_name
 
-    face_memory = load_memory(FACE_MEMORY_FILE)
-
-    while True:
-        success, frame = video_capture.read()
-        if not success:
-            break
-
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-        recognized_name = "Unknown"
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=0.5)
-            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-            
-            if True in matches:
-                best_match_index = np.argmin(face_distances)
-                recognized_name = known_names[best_match_index].strip()
-
-                # Draw bounding box on the detected face
-                top, right, bottom, left = [v * 4 for v in face_location]  # Scale back up
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                cv2.putText(frame, recognized_name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-        # Store recognized face in memory
-        face_memory["last_seen"] = recognized_name
-        save_memory(FACE_MEMORY_FILE, face_memory)
+    changes = {}
+    if camera is primary_camera:
+        recognized_name = name
+        changes["last_seen"] = name
+
+    # Store recognized face in memory in one locked step (cameras report from their own threads);
+    # only written to disk when it changes
+    face_memory.update_entry("cameras", camera.name, name, **changes)
+    person = people.get(name) if name != "Unknown" else None
+    relation = (person["details"] or {}).get("Relation") or person["relation"] if person else None
+    event_bus.publish("name", {"camera": camera.name, "name": name, "primary": camera is primary_camera,
+                               "relation": relation})
+
+def on_camera_seen(camera, names):
+    """Feed every known person in view into the visit sessionizer (in-memory, every frame)."""
+    visit_sessionizer.observe(names)
+
+# One capture/recognition pipeline per camera, all sharing face_gallery
+face_memory = FaceMemoryStore(FACE_MEMORY_FILE, load_memory(FACE_MEMORY_FILE), FACE_MEMORY_WRITE_INTERVAL)
+visit_sessionizer = VisitSessionizer(db, VISIT_ABSENCE_TIMEOUT, VISIT_FLUSH_INTERVAL, on_arrival=people.touch)
+detection_scheduler = DetectionScheduler(MAX_DETECTIONS_PER_SECOND)
+cameras = {}
+for camera_name, camera_config in CAMERA_SOURCES.items():
+    cameras[camera_name] = CameraPipeline(
+        camera_name, camera_config["source"], face_gallery, detection_scheduler, on_camera_recognized,
+        priority=camera_config.get("priority", 1),
+        detection_mode=DETECTION_MODE,
+        motion_threshold=MOTION_THRESHOLD,
+        detect_every=DETECT_EVERY_N_FRAMES,
+        workers=camera_config.get("workers", RECOGNITION_WORKERS),
+        max_in_flight=MAX_FRAMES_IN_FLIGHT,
+        target_fps=camera_config.get("target_fps", TARGET_FPS),
+        on_seen=on_camera_seen,
+        reverify_every=IDENTITY_REVERIFY_FRAMES,
+        min_margin=IDENTITY_MIN_MARGIN,
+        recent_frames=RECENT_FRAMES,
+    )
+primary_camera = next(iter(cameras.values()))
+video_capture = primary_camera.capture
 
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
+# Every camera recognizes and logs visits from startup, not only while someone watches its stream
+for pipeline in cameras.values():
+    pipeline.start()
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+def generate_frames(camera=None, profile=DEFAULT_PROFILE, max_fps=None):
+    """Stream the latest annotated frames from a camera's shared capture pipeline."""
+    return (camera or primary_camera).broadcaster.stream(profile, max_fps)
 
 @app.route('/')
 def index():
@@ -356,16 +524,118 @@ def index():
     return render_template('index.html')
 
 @app.route('/video_feed')
-def video_feed():
-    """Provide the video feed."""
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed/<camera_name>')
+def video_feed(camera_name=None):
+    """Provide the video feed for the primary camera or a named one.
+
+    Optional query parameters: profile (high/medium/low) and fps (max frames per second).
+    """
+    camera = cameras.get(camera_name) if camera_name else primary_camera
+    if camera is None:
+        return jsonify({"error": f"Unknown camera: {camera_name}"}), 404
+
+    profile = request.args.get('profile', DEFAULT_PROFILE)
+    if profile not in STREAM_PROFILES:
+        return jsonify({"error": f"Unknown profile: {profile}", "profiles": list(STREAM_PROFILES)}), 400
+    try:
+        max_fps = float(request.args['fps']) if 'fps' in request.args else None
+    except ValueError:
+        return jsonify({"error": "fps must be a number"}), 400
+    if max_fps is not None and max_fps <= 0:
+        return jsonify({"error": "fps must be positive"}), 400
+
+    return Response(generate_frames(camera, profile, max_fps), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/cameras')
+def list_cameras():
+    """List configured cameras and what each one currently sees."""
+    return jsonify({"primary": primary_camera.name,
+                    "cameras": [{"name": c.name, "priority": c.priority, "name_seen": c.recognized_name}
+                                for c in cameras.values()]})
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Report per-camera recognition throughput and the detection budget."""
+    return jsonify({"cameras": [camera.stats() for camera in cameras.values()],
+                    "detection_tokens": detection_scheduler.stats(),
+                    "events": event_bus.stats(),
+                    "people": people.stats(),
+                    "retention": retention.stats(),
+                    "reminders": dict(reminder_engine.stats(), day_cache=reminder_days.stats())})
 
 @app.route('/get_detected_name')
-def get_detected_name():
-    """Send the detected name to the frontend."""
-    global recognized_name
+@app.route('/get_detected_name/<camera_name>')
+def get_detected_name(camera_name=None):
+    """Send the detected name (primary camera unless one is named) to the frontend."""
+    if camera_name:
+        camera = cameras.get(camera_name)
+        if camera is None:
+            return jsonify({"error": f"Unknown camera: {camera_name}"}), 404
+        return jsonify({"name": camera.recognized_name, "camera": camera.name})
     return jsonify({"name": recognized_name})
 
+@app.route('/events')
+def events():
+    """Server-sent event stream of recognized-name changes and due reminders.
+
+    Browsers reconnect with the Last-Event-ID header and get the events they missed.
+    """
+    def snapshot():
+        state = [("name", {"camera": camera.name, "name": camera.recognized_name, "primary": camera is primary_camera})
+                 for camera in cameras.values()]
+        return state + [("resync", {})]
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    return Response(event_bus.stream(last_event_id, snapshot), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/current_visits')
+def current_visits():
+    """List people currently visiting, with arrival time and how long they have stayed."""
+    visits = [{"name": name, "arrival": arrival.strftime("%Y-%m-%d %H:%M:%S"), "dwell_seconds": int(dwell)}
+              for name, arrival, dwell in visit_sessionizer.current_visits()]
+    return jsonify({"visits": visits})
+
+@app.route('/visit_summary')
+def visit_summary():
+    """Visits and dwell time from the rollups: ?name=Alice for one person (by=day|week), else everyone.
+
+    since/until are YYYY-MM-DD (inclusive) and default to this month so far.
+    """
+    today = datetime.now().date()
+    try:
+        since = datetime.strptime(request.args.get('since', ''), '%Y-%m-%d').date() if request.args.get('since') else today.replace(day=1)
+        until = datetime.strptime(request.args.get('until', ''), '%Y-%m-%d').date() if request.args.get('until') else today
+    except ValueError:
+        return jsonify({"error": "since and until must be YYYY-MM-DD"}), 400
+    by = request.args.get('by', 'day')
+    if by not in ('day', 'week'):
+        return jsonify({"error": "by must be day or week"}), 400
+
+    name = request.args.get('name', '').strip()
+    conn = db.connect()
+    try:
+        if name:
+            return jsonify(visit_rollups.person_summary(conn, name, since, until, by))
+        return jsonify({"since": since.isoformat(), "until": until.isoformat(),
+                        "people": visit_rollups.everyone_summary(conn, since, until)})
+    finally:
+        conn.close()
+
+@app.route('/absent_visitors')
+def absent_visitors():
+    """Known people not seen for ?days= days (default ABSENT_AFTER_DAYS), including those never seen."""
+    try:
+        days = int(request.args.get('days', ABSENT_AFTER_DAYS))
+    except ValueError:
+        return jsonify({"error": "days must be a number"}), 400
+    conn = db.connect()
+    try:
+        absent = visit_rollups.not_seen_since(conn, datetime.now() - timedelta(days=days), people.names())
+    finally:
+        conn.close()
+    return jsonify({"days": days, "people": absent})
+
 @app.route('/get_details', methods=['POST'])
 def get_details():
     data = request.get_json()
@@ -376,31 +646,18 @@ def get_details():
 
     print(f"🔍 Searching details for: {name}")
 
-    # Check CSV first
-    person_details = people_df[people_df["Name"].str.lower() == name.lower()]
-    if not person_details.empty:
-        details = {
-            "Name": person_details.iloc[0]["Name"],
-            "Relation": person_details.iloc[0]["Relation"],
-            "Age": str(person_details.iloc[0]["Age"]),
-            "Medical_History": person_details.iloc[0]["Medical_History"],
-            "Last_Visit": person_details.iloc[0]["Last_Visit"],
-            "Notes": person_details.iloc[0]["Notes"]
-        }
-        return jsonify(details)
+    person = people.get(name)
 
-    # Check database if not found in CSV
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, relation, last_visit FROM known_people WHERE LOWER(name)=?", (name.lower(),))
-    db_record = cursor.fetchone()
-    conn.close()
+    # Details entered at enrollment first
+    if person and person["details"]:
+        return jsonify(person["details"])
 
-    if db_record:
+    # Otherwise what the visit log knows
+    if person and person["last_visit"]:
         details = {
-            "Name": db_record[0],
-            "Relation": db_record[1],
-            "Last_Visit": db_record[2]
+            "Name": person["name"],
+            "Relation": person["relation"],
+            "Last_Visit": person["last_visit"]
         }
         return jsonify(details)
 
@@ -432,20 +689,23 @@ def check_time():
         }
     })
 
+chat_memory_lock = threading.Lock()  # Shared with the retention service, which trims the same file
+
 def load_chat_memory():
     """Load chat memory from file"""
-    if os.path.exists(CHAT_MEMORY_FILE):
-        try:
-            with open(CHAT_MEMORY_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {"memories": [], "is_recording": False}
-    return {"memories": [], "is_recording": False}
+    with chat_memory_lock:
+        if os.path.exists(CHAT_MEMORY_FILE):
+            try:
+                with open(CHAT_MEMORY_FILE, 'r') as f:
+                    return json.load(f)
+            except:
+                return {"memories": [], "is_recording": False}
+        return {"memories": [], "is_recording": False}
 
 def save_chat_memory(memory_data):
     """Save chat memory to file"""
-    with open(CHAT_MEMORY_FILE, 'w') as f:
-        json.dump(memory_data, f, indent=4)
+    with chat_memory_lock:
+        write_json_atomic(CHAT_MEMORY_FILE, memory_data)
 
 @app.route('/chatbot', methods=['POST'])
 def chatbot():
@@ -496,7 +756,7 @@ def chatbot():
                 return jsonify({"response": "Entry saved. Continue writing or type 'close memory' when done."})
         
         # Get patient info
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
 
         # Get basic patient info
@@ -622,13 +882,13 @@ def chatbot():
         if "who is" in user_message and ("camera" in user_message or "front" in user_message):
             global recognized_name
             if recognized_name != "Unknown":
-                # Get person details from CSV first
-                person_details = people_df[people_df["Name"].str.lower() == recognized_name.lower()]
-                if not person_details.empty:
+                person = people.get(recognized_name)
+                # Details entered at enrollment first
+                if person and person["details"]:
                     details = {
-                        "relation": person_details.iloc[0]["Relation"],
-                        "age": person_details.iloc[0]["Age"],
-                        "notes": person_details.iloc[0]["Notes"]
+                        "relation": person["details"]["Relation"],
+                        "age": person["details"]["Age"],
+                        "notes": person["details"]["Notes"]
                     }
                     response = f"I can see {recognized_name} in front of the camera. "
                     if details["relation"]:
@@ -637,11 +897,9 @@ def chatbot():
                         response += f"{details['notes']}"
                     return jsonify({"response": response.strip()})
                 
-                # If not in CSV, check database
-                cursor.execute("SELECT relation, last_visit FROM known_people WHERE name=?", (recognized_name,))
-                person_info = cursor.fetchone()
-                if person_info:
-                    relation, last_visit = person_info
+                # Otherwise what the visit log knows
+                if person and person["last_visit"]:
+                    relation, last_visit = person["relation"], person["last_visit"]
                     response = f"I can see {recognized_name} in front of the camera."
                     if relation:
                         response += f" They are your {relation}."
@@ -745,7 +1003,7 @@ def create_reminder():
         add_reminder(title, description, due_time, category, is_recurring, recurrence_pattern)
         
         # Verify the reminder was added correctly
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         cursor.execute('''
         SELECT title, description, due_time, category 
@@ -755,7 +1013,8 @@ def create_reminder():
         added_reminder = cursor.fetchone()
         print(f"Verified added reminder in database: {added_reminder}")
         conn.close()
-        
+
+        event_bus.publish("reminders_changed", {})
         return jsonify({"message": "Reminder added successfully"})
     except Exception as e:
         print(f"Error adding reminder: {e}")
@@ -766,16 +1025,7 @@ def check_upcoming():
     """Check for upcoming reminders"""
     try:
         upcoming = check_upcoming_reminders()
-        formatted_upcoming = []
-        for reminder in upcoming:
-            formatted_upcoming.append({
-                "id": reminder[0],
-                "title": reminder[1],
-                "description": reminder[2],
-                "due_time": reminder[3],
-                "category": reminder[4]
-            })
-        return jsonify({"upcoming_reminders": formatted_upcoming})
+        return jsonify({"upcoming_reminders": [format_upcoming(reminder) for reminder in upcoming]})
     except Exception as e:
         print(f"Error checking upcoming reminders: {e}")
         return jsonify({"error": "Failed to check upcoming reminders"}), 500
@@ -789,202 +1039,283 @@ def mark_complete():
         
         if not reminder_id:
             return jsonify({"error": "Reminder ID is required"}), 400
-            
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE reminders SET is_completed = 1 WHERE id = ?', (reminder_id,))
-        conn.commit()
-        conn.close()
-        
+        ids, errors = parse_reminder_ids([reminder_id])
+        if errors:
+            return jsonify({"error": errors[0]}), 400
+
+        # A recurring reminder moves on to its next occurrence instead of finishing
+        if ids[0] not in complete_reminders(ids):
+            return jsonify({"error": "Reminder not found or completed"}), 404
+
+        event_bus.publish("reminders_changed", {})
         return jsonify({"message": "Reminder marked as completed"})
     except Exception as e:
         print(f"Error marking reminder complete: {e}")
         return jsonify({"error": "Failed to mark reminder as complete"}), 500
 
+def parse_reminder_ids(values):
+    """Split bulk request ids into (valid int ids, {index: error})."""
+    ids, errors = [], {}
+    for index, value in enumerate(values):
+        if isinstance(value, int) and not isinstance(value, bool):
+            ids.append(value)
+        elif isinstance(value, str) and value.strip().isdigit():
+            ids.append(int(value))
+        else:
+            errors[index] = f"Invalid reminder id: {value!r}"
+    return ids, errors
+
+@app.route('/add_reminders', methods=['POST'])
+def create_reminders():
+    """Add many reminders at once: {"reminders": [{title, due_time, description, category, ...}, ...]}.
+
+    Every item is validated first; the valid ones are inserted in one transaction.
+    Returns one result per item, in request order.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('reminders')
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a JSON body with a 'reminders' list"}), 400
+
+    results, valid, positions = [], [], []
+    for index, item in enumerate(items):
+        fields, error = normalize_reminder(item)
+        if error:
+            results.append({"index": index, "success": False, "error": error})
+        else:
+            results.append(None)
+            valid.append(fields)
+            positions.append(index)
+    try:
+        ids = add_reminders(valid)
+    except Exception as e:
+        print(f"Error adding reminders: {e}")
+        return jsonify({"error": "Failed to add reminders"}), 500
+
+    for index, reminder_id, fields in zip(positions, ids, valid):
+        results[index] = {"index": index, "success": True, "id": reminder_id, "due_time": fields['due_time']}
+    if ids:
+        event_bus.publish("reminders_changed", {})
+    return jsonify({"added": len(ids), "results": results})
+
+@app.route('/update_reminders', methods=['POST'])
+def edit_reminders():
+    """Edit many reminders at once: {"reminders": [{"id": 1, "due_time": ..., ...}, ...]} (only given fields change)."""
+    data = request.get_json(silent=True) or {}
+    items = data.get('reminders')
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a JSON body with a 'reminders' list"}), 400
+
+    ids, errors = parse_reminder_ids([item.get('id') if isinstance(item, dict) else None for item in items])
+    seen, duplicates = set(), set()
+    for reminder_id in ids:
+        (duplicates if reminder_id in seen else seen).add(reminder_id)
+    if duplicates:
+        return jsonify({"error": f"Each reminder may appear only once; repeated ids: {sorted(duplicates)}"}), 400
+    results, changes, positions = [None] * len(items), {}, {}
+    id_iter = iter(ids)
+    for index, item in enumerate(items):
+        if index in errors:
+            results[index] = {"index": index, "success": False, "error": errors[index]}
+            continue
+        reminder_id = next(id_iter)
+        fields, error = normalize_reminder(item, partial=True)
+        if error:
+            results[index] = {"index": index, "success": False, "error": error}
+        else:
+            changes[reminder_id] = fields
+            positions[reminder_id] = index
+    try:
+        updated = set(update_reminders(changes))
+    except Exception as e:
+        print(f"Error updating reminders: {e}")
+        return jsonify({"error": "Failed to update reminders"}), 500
+
+    for reminder_id, index in positions.items():
+        if reminder_id in updated:
+            results[index] = {"index": index, "success": True, "id": reminder_id}
+        else:
+            results[index] = {"index": index, "success": False, "id": reminder_id, "error": "Reminder not found or completed"}
+    if updated:
+        event_bus.publish("reminders_changed", {})
+    return jsonify({"updated": len(updated), "results": results})
+
+@app.route('/complete_reminders', methods=['POST'])
+def mark_complete_many():
+    """Complete many reminders at once: {"ids": [1, 2, 3]}."""
+    data = request.get_json(silent=True) or {}
+    values = data.get('ids')
+    if not isinstance(values, list):
+        return jsonify({"error": "Expected a JSON body with an 'ids' list"}), 400
+
+    ids, errors = parse_reminder_ids(values)
+    try:
+        next_due = complete_reminders(list(dict.fromkeys(ids)))
+    except Exception as e:
+        print(f"Error completing reminders: {e}")
+        return jsonify({"error": "Failed to complete reminders"}), 500
+
+    results, id_iter = [], iter(ids)
+    for index in range(len(values)):
+        if index in errors:
+            results.append({"index": index, "success": False, "error": errors[index]})
+            continue
+        reminder_id = next(id_iter)
+        if reminder_id not in next_due:
+            results.append({"index": index, "success": False, "id": reminder_id, "error": "Reminder not found or completed"})
+        else:
+            due = next_due[reminder_id]
+            results.append({"index": index, "success": True, "id": reminder_id,
+                            "next_due_time": due.strftime('%Y-%m-%d %H:%M:%S') if due else None})
+    if next_due:
+        event_bus.publish("reminders_changed", {})
+    return jsonify({"completed": len(next_due), "results": results})
+
 @app.route('/capture_person', methods=['POST'])
 def capture_person():
+    """Save the best recent frame of the primary camera (largest, sharpest, most confident face)."""
     try:
-        # Get the current frame from the video feed
-        ret, frame = video_capture.read()
-        if not ret:
+        # Pick from frames the pipeline already captured; read a short burst only if it has none yet
+        frames = primary_camera.recent_frames()
+        if not frames:
+            frames = [frame for ret, frame in (video_capture.read() for _ in range(CAPTURE_BURST_FRAMES)) if ret]
+        if not frames:
             return jsonify({'success': False, 'error': 'Failed to capture image'})
 
+        frame, quality = pick_best_frame(frames)
+        if frame is None:
+            return jsonify({'success': False, 'error': 'No face found - please look at the camera and try again'})
+
         # Create a directory for temporary captures if it doesn't exist
-        if not os.path.exists('temp_captures'):
-            os.makedirs('temp_captures')
+        if not os.path.exists(CAPTURES_DIR):
+            os.makedirs(CAPTURES_DIR)
 
         # Save the captured image with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        image_path = f'temp_captures/capture_{timestamp}.jpg'
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        image_path = f'{CAPTURES_DIR}/capture_{timestamp}.jpg'
         cv2.imwrite(image_path, frame)
 
-        return jsonify({'success': True, 'image_path': image_path})
+        return jsonify({'success': True, 'image_path': image_path, 'quality': quality})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def is_within(path, folder):
+    """True if path resolves (symlinks included) to somewhere inside folder."""
+    folder = os.path.realpath(folder)
+    return os.path.commonpath([os.path.realpath(path), folder]) == folder
+
+def person_folder(name):
+    """known_faces/<name>, or None if the name could escape known_faces/ (separators, '..', hidden names)."""
+    if not name or name.startswith('.') or '..' in name or '\0' in name or any(sep in name for sep in ('/', '\\', os.sep)):
+        return None
+    person_dir = os.path.join(KNOWN_FACES_DIR, name)
+    return person_dir if is_within(person_dir, KNOWN_FACES_DIR) else None
+
+def file_enrollment(job, image_paths):
+    """Before the gallery changes: file the photos under known_faces/<name>/ and save the person's details."""
+    name = job["name"]
+    data = job["details"]
+    person_dir = person_folder(name)
+    if person_dir is None:
+        raise ValueError(f"Invalid person name: {name!r}")
+
+    # Move the new photos in first, then drop the earlier ones, so a failure never leaves the person without photos
+    os.makedirs(person_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filed = set()
+    for i, image_path in enumerate(image_paths):
+        if os.path.exists(image_path):
+            filename = f"{timestamp}_{i}.jpg"
+            os.replace(image_path, os.path.join(person_dir, filename))
+            filed.add(filename)
+    if not filed:
+        raise FileNotFoundError("The captured photos are gone; please capture again")
+
+    # Replace any earlier photos so encode_faces.py rebuilds the same gallery
+    old_photo = os.path.join(KNOWN_FACES_DIR, f"{name}.jpg")
+    if os.path.exists(old_photo):
+        os.remove(old_photo)
+    for filename in os.listdir(person_dir):
+        if filename not in filed:
+            os.remove(os.path.join(person_dir, filename))
+
+    # Update the people registry, which writes through to the CSV file and known_people
+    people.upsert(name, {
+        "Relation": data.get('relation', ''),
+        "Age": data.get('age', ''),
+        "Medical_History": data.get('medical_history', ''),
+        "Last_Visit": datetime.now().strftime('%Y-%m-%d'),
+        "Notes": data.get('notes', '')
+    }, relation=data.get('relation') or 'Unknown')
+
+enrollment_queue = EnrollmentQueue(
+    face_gallery, encoding_store, workers=ENROLLMENT_WORKERS, mode=ENROLLMENT_MODE,
+    on_enrolled=file_enrollment, on_update=lambda job: event_bus.publish("enrollment", job),
+)
+
+# Keep captures, unknown faces, visit history and chat memory from filling the disk
+retention = RetentionService(db, {
+    "captures": (FileStore(CAPTURES_DIR), RETENTION_POLICIES["captures"]),
+    "unknown_faces": (FileStore(UNKNOWN_FACES_DIR, min_age=0), RETENTION_POLICIES["unknown_faces"]),
+    "visit_history": (TableStore(db, "visit_history", "visit_date"), RETENTION_POLICIES["visit_history"]),
+    "chat_memory": (JsonListStore(CHAT_MEMORY_FILE, "memories", lock=chat_memory_lock),
+                    RETENTION_POLICIES["chat_memory"]),
+}, max_deletes=RETENTION_MAX_DELETES, deletes_per_second=RETENTION_DELETES_PER_SECOND)
+scheduler.add_job(retention.run, "interval", minutes=RETENTION_INTERVAL_MINUTES, id="retention",
+                  next_run_time=datetime.now() + timedelta(minutes=1))
+scheduler.add_job(retention.vacuum, "cron", hour=RETENTION_VACUUM_HOUR, id="vacuum")
+
 @app.route('/add_person', methods=['POST'])
 def add_person():
-    """Add a new person with their details and face encoding."""
-    try:
-        # Get and validate request data
-        data = request.get_json()
-        print(f"Received data: {data}")  # Debug print
-        
-        if not data:
-            return jsonify({'success': False, 'error': 'No data received'}), 400
-
-        # Validate required fields
-        if 'image_path' not in data:
-            return jsonify({'success': False, 'error': 'Image path is required'}), 400
-        if 'name' not in data or not data['name'].strip():
-            return jsonify({'success': False, 'error': 'Name is required'}), 400
-
-        image_path = data['image_path']
-        name = data['name'].strip()
+    """Queue enrollment of a new person from one or more captured photos.
 
-        print(f"Processing person: {name}, Image: {image_path}")  # Debug print
-        
-        # Validate image path exists
-        if not os.path.exists(image_path):
-            return jsonify({'success': False, 'error': f'Image not found at: {image_path}'}), 404
-
-        # Create known_faces directory if it doesn't exist
-        os.makedirs(KNOWN_FACES_DIR, exist_ok=True)
-
-        # Move the image to known_faces directory
-        new_image_path = os.path.join(KNOWN_FACES_DIR, f"{name}.jpg")
-        if os.path.exists(new_image_path):
-            os.remove(new_image_path)  # Remove if exists
-        os.rename(image_path, new_image_path)
-        print(f"Moved image to: {new_image_path}")  # Debug print
-
-        try:
-            # Load and encode the face
-            image = face_recognition.load_image_file(new_image_path)
-            # Convert BGR to RGB if needed
-            if len(image.shape) == 3 and image.shape[2] == 3:
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            else:
-                rgb_image = image
-            
-            # Detect face locations first
-            face_locations = face_recognition.face_locations(rgb_image)
-            if not face_locations:
-                if os.path.exists(new_image_path):
-                    os.remove(new_image_path)
-                return jsonify({'success': False, 'error': 'No face detected in the image. Please try capturing again.'}), 400
-            
-            # Get face encodings
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-            if not face_encodings:
-                if os.path.exists(new_image_path):
-                    os.remove(new_image_path)
-                return jsonify({'success': False, 'error': 'Could not encode the face. Please try capturing again.'}), 400
-            
-            print("Face detected and encoded successfully")  # Debug print
-            
-            # Update face encodings
-            global known_encodings, known_names
-            
-            # Remove existing encodings for this person if they exist
-            if name in known_names:
-                indices = [i for i, n in enumerate(known_names) if n == name]
-                for index in sorted(indices, reverse=True):
-                    known_names.pop(index)
-                    known_encodings.pop(index)
-            
-            known_encodings.append(face_encodings[0])
-            known_names.append(name)
-            
-            # Save updated encodings
-            try:
-                with open(ENCODINGS_FILE, 'wb') as f:
-                    pickle.dump({
-                        "encodings": known_encodings,
-                        "names": known_names
-                    }, f)
-                print("Face encodings saved successfully")  # Debug print
-            except Exception as e:
-                print(f"Error saving encodings: {e}")
-                raise
-
-            # Update CSV file
-            try:
-                if os.path.exists(CSV_FILE):
-                    people_df = pd.read_csv(CSV_FILE)
-                else:
-                    people_df = pd.DataFrame(columns=["Name", "Relation", "Age", "Medical_History", "Last_Visit", "Notes"])
-                
-                # Add new person to DataFrame
-                new_person = pd.DataFrame([{
-                    "Name": name,
-                    "Relation": data.get('relation', ''),
-                    "Age": data.get('age', ''),
-                    "Medical_History": data.get('medical_history', ''),
-                    "Last_Visit": datetime.now().strftime('%Y-%m-%d'),
-                    "Notes": data.get('notes', '')
-                }])
-                
-                # Remove existing entry if exists
-                people_df = people_df[people_df["Name"].str.lower() != name.lower()]
-                people_df = pd.concat([people_df, new_person], ignore_index=True)
-                people_df.to_csv(CSV_FILE, index=False)
-                print("CSV file updated successfully")  # Debug print
-            except Exception as e:
-                print(f"Warning - CSV update failed: {e}")
-                # Continue even if CSV update fails
-
-            # Update database
-            try:
-                conn = sqlite3.connect(DB_FILE)
-                cursor = conn.cursor()
-
-                # Remove existing entry if exists
-                cursor.execute("DELETE FROM known_people WHERE LOWER(name)=?", (name.lower(),))
-                
-                # Insert new entry
-                cursor.execute('''
-                    INSERT INTO known_people (name, relation, last_visit)
-                    VALUES (?, ?, ?)
-                ''', (
-                    name, 
-                    data.get('relation', 'Unknown'),
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                ))
-                conn.commit()
-                print("Database updated successfully")  # Debug print
-            except Exception as e:
-                print(f"Error updating database: {e}")
-                raise
-            finally:
-                if 'conn' in locals():
-                    conn.close()
-
-            return jsonify({
-                'success': True,
-                'message': f'Successfully added {name} to known faces'
-            })
-            
-        except Exception as e:
-            # If there was an error during processing, clean up
-            if os.path.exists(new_image_path):
-                os.remove(new_image_path)
-            print(f"Error processing image: {str(e)}")  # Debug print
-            raise
-
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Error adding person: {error_msg}")  # Debug print
-        return jsonify({
-            'success': False,
-            'error': f'Failed to save person details: {error_msg}'
-        }), 500
+    Returns 202 with a job id right away; follow the job at /enrollment/<job_id>
+    or through "enrollment" events on /events.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({'success': False, 'error': 'No data received'}), 400
+
+    # Validate required fields
+    image_paths = data.get('image_paths') or ([data['image_path']] if data.get('image_path') else [])
+    if not image_paths:
+        return jsonify({'success': False, 'error': 'Image path is required'}), 400
+    if 'name' not in data or not data['name'].strip():
+        return jsonify({'success': False, 'error': 'Name is required'}), 400
+    name = data['name'].strip()
+    if person_folder(name) is None:
+        return jsonify({'success': False, 'error': 'Name must not contain path separators or ".."'}), 400
+    # Only photos taken by /capture_person may be enrolled (they are moved into known_faces/)
+    outside = [path for path in image_paths if not isinstance(path, str) or not is_within(path, CAPTURES_DIR)]
+    if outside:
+        return jsonify({'success': False, 'error': f'Not a captured image: {outside[0]}'}), 400
+    missing = [path for path in image_paths if not os.path.isfile(path)]
+    if missing:
+        return jsonify({'success': False, 'error': f'Image not found at: {missing[0]}'}), 404
+
+    details = {key: data.get(key, '') for key in ('relation', 'age', 'medical_history', 'notes')}
+    job_id = enrollment_queue.submit(name, image_paths, details)
+    print(f"Queued enrollment {job_id} for {name} with {len(image_paths)} image(s)")
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/enrollment/{job_id}',
+        'message': f'Adding {name} to known faces'
+    }), 202
+
+@app.route('/enrollment/<job_id>')
+def enrollment_status(job_id):
+    """Status of a queued enrollment: queued, encoding, done or failed."""
+    job = enrollment_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown enrollment job: {job_id}'}), 404
+    return jsonify(job)
 
 @app.route('/debug/db', methods=['GET'])
 def debug_db():
     """Debug endpoint to check database structure"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Get all tables
@@ -1015,44 +1346,14 @@ def debug_db():
         if 'conn' in locals():
             conn.close()
 
-def ensure_reminders_table():
-    """Ensure the reminders table exists with the correct structure"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Create reminders table if it doesn't exist
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS reminders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            due_time DATETIME NOT NULL,
-            category TEXT DEFAULT 'general',
-            is_completed INTEGER DEFAULT 0,
-            is_recurring INTEGER DEFAULT 0,
-            recurrence_pattern TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_notification DATETIME
-        )
-        ''')
-        
-        conn.commit()
-        print("Reminders table verified")
-    except Exception as e:
-        print(f"Error ensuring reminders table: {e}")
-        raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
-
 def clear_reminders():
     """Clear all existing reminders from the database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM reminders")
         conn.commit()
+        reminder_days.clear()
         print("All reminders cleared from database")
     except Exception as e:
         print(f"Error clearing reminders: {e}")
@@ -1060,8 +1361,6 @@ def clear_reminders():
         if 'conn' in locals():
             conn.close()
 
-# Call these functions during initialization
-ensure_reminders_table()
 # Remove the clear_reminders() call to prevent clearing existing reminders
 # clear_reminders()  # Commented out to prevent clearing reminders on startup
 
@@ -1072,7 +1371,7 @@ ensure_reminders_table()
 def debug_reminders():
     """Debug endpoint to check reminders table content"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Get table structure
@@ -1098,7 +1397,7 @@ def debug_reminders():
 def check_current_reminders():
     """Check and print all current reminders in the database"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -0,0 +1,75 @@
+"""Recall-vs-latency benchmark for the face matching indexes in face_index.py.
+
+Usage: python benchmark_face_index.py --gallery 20000 --queries 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from face_index import ENCODING_SIZE, BruteForceIndex, ClusterIndex, QuantizedIndex
+
+
+def make_gallery(size, rng):
+    """Synthetic encodings shaped like face_recognition output (unit-ish norm, small components)."""
+    vectors = rng.normal(0.0, 0.09, size=(size, ENCODING_SIZE)).astype(np.float32)
+    return vectors
+
+
+def make_queries(gallery, count, noise, rng):
+    """Noisy copies of random gallery entries - the same person seen again by the camera."""
+    targets = rng.integers(0, len(gallery), size=count)
+    queries = gallery[targets] + rng.normal(0.0, noise, size=(count, ENCODING_SIZE)).astype(np.float32)
+    return queries, targets
+
+
+def run(name, index, gallery, queries, truth, batch):
+    ids = np.arange(len(gallery))
+    start = time.perf_counter()
+    index.add(ids, gallery)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    found = []
+    for offset in range(0, len(queries), batch):
+        chunk = queries[offset:offset + batch]
+        start = time.perf_counter()
+        best_ids, _ = index.search(chunk)
+        latencies.append((time.perf_counter() - start) * 1000 / len(chunk))
+        found.append(best_ids)
+    found = np.concatenate(found)
+
+    recall = float(np.mean(found == truth))
+    print(f"{name:<20} recall@1={recall:.4f}  "
+          f"p50={np.percentile(latencies, 50):.3f} ms/face  p95={np.percentile(latencies, 95):.3f} ms/face  "
+          f"build={build_seconds:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gallery", type=int, default=20000, help="number of enrolled encodings")
+    parser.add_argument("--queries", type=int, default=500, help="number of query faces")
+    parser.add_argument("--batch", type=int, default=4, help="faces matched per call (faces per frame)")
+    parser.add_argument("--noise", type=float, default=0.02, help="per-component query noise")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    gallery = make_gallery(args.gallery, rng)
+    queries, _ = make_queries(gallery, args.queries, args.noise, rng)
+
+    # Ground truth is the exact nearest neighbour, not the generating entry
+    exact = BruteForceIndex()
+    exact.add(np.arange(len(gallery)), gallery)
+    truth, _ = exact.search(queries)
+
+    print(f"Gallery: {args.gallery} encodings, {args.queries} queries, batch {args.batch}")
+    run("exact", BruteForceIndex(), gallery, queries, truth, args.batch)
+    run("float16", QuantizedIndex("float16"), gallery, queries, truth, args.batch)
+    run("int8", QuantizedIndex("int8"), gallery, queries, truth, args.batch)
+    for nprobe in (1, 4, 16):
+        run(f"cluster nprobe={nprobe}", ClusterIndex(nprobe=nprobe), gallery, queries, truth, args.batch)
+
+
+if __name__ == "__main__":
+    main()
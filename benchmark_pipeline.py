@@ -0,0 +1,290 @@
+"""Offline replay benchmark for the recognition pipeline (no webcam needed).
+
+Feeds a recorded video or a folder of images to a real CameraPipeline in
+place of the webcam, so detection gating, tracking, the identity cache, the
+adaptive scaler and (with --workers) the recognition worker processes all run
+as they do on the live feed, followed by the stream's JPEG encoding. Reports
+FPS, per-stage p50/p95/p99 latency, peak RSS and match accuracy.
+
+Usage:
+    python benchmark_pipeline.py --video visit.mp4 --truth visit_truth.json --output results.json
+    python benchmark_pipeline.py --images test_frames/ --synthetic-identities 10000 --workers 2
+    python benchmark_pipeline.py --video visit.mp4 --fps 30 --detections-per-second 10
+
+Frames are replayed as fast as the pipeline takes them unless --fps paces
+them like a camera; the detection budget (--detections-per-second) is only
+meaningful when paced.
+
+The ground-truth file is JSON mapping a frame index (video) or file name
+(images) to the list of names expected in that frame, e.g. {"0": ["Alice"], "12": []}.
+Frames missing from the file are not scored.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from benchmark_face_index import make_gallery
+from cameras import CameraPipeline, DetectionScheduler
+from encoding_store import EncodingStore
+from face_gallery import FaceGallery
+from video_stream import DEFAULT_PROFILE, STREAM_PROFILES, encode_jpeg
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# prepare = downscale + gating decision, detection = detection + encoding (detected frames only),
+# finish = identity cache, matching or tracking, and annotation
+STAGES = ("prepare", "detection", "finish", "jpeg")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def replay_frames(video=None, images=None):
+    """Yield (key, frame) from a video file (key = frame index) or an image folder (key = file name)."""
+    if video:
+        capture = cv2.VideoCapture(video)
+        index = 0
+        while True:
+            success, frame = capture.read()
+            if not success:
+                break
+            yield str(index), frame
+            index += 1
+        capture.release()
+    else:
+        for filename in sorted(os.listdir(images)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(images, filename))
+                if frame is not None:
+                    yield filename, frame
+
+
+class ReplayCapture:
+    """Stands in for the camera: read() hands out the recorded frames, then fails like a closed device.
+
+    Keys of the frames read so far wait in keys until the pipeline finishes them, in order.
+    """
+
+    def __init__(self, frames, fps=None):
+        self.frames = iter(frames)
+        self.upcoming = next(self.frames, None)  # Read ahead so finished is known once the last frame is out
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_at = None
+        self.keys = deque()
+        self.read_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.upcoming is None
+
+    def read(self):
+        with self.lock:
+            if self.upcoming is None:
+                return False, None
+            if self.interval:
+                now = time.perf_counter()
+                if self.next_at is not None and self.next_at > now:
+                    time.sleep(self.next_at - now)
+                self.next_at = max(self.next_at or now, now) + self.interval
+            key, frame = self.upcoming
+            self.upcoming = next(self.frames, None)
+            self.keys.append(key)
+            self.read_count += 1
+            return True, frame
+
+    def release(self):
+        pass
+
+
+class TimedPipeline(CameraPipeline):
+    """CameraPipeline that times its stages and notes the known names in each finished frame."""
+
+    def __init__(self, *args, **kwargs):
+        self.timings = {stage: [] for stage in STAGES}
+        self.results = []  # (frame key, names) in frame order
+        self.seen = []
+        super().__init__(*args, on_recognized=lambda camera, name: None,
+                         on_seen=lambda camera, names: camera.seen.extend(names), **kwargs)
+
+    def _timed(self, stage, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        self.timings[stage].append(time.perf_counter() - started)
+        return result
+
+    def prepare_frame(self, frame):
+        return self._timed("prepare", super().prepare_frame, frame)
+
+    def record_detection(self, frame, small_frame, upsample, seconds, face_locations):
+        self.timings["detection"].append(seconds)
+        super().record_detection(frame, small_frame, upsample, seconds, face_locations)
+
+    def finish_frame(self, frame, small_frame, detection):
+        self.seen = []
+        frame = self._timed("finish", super().finish_frame, frame, small_frame, detection)
+        self.results.append((self.capture.keys.popleft(), {name for name in self.seen if name != "Unknown"}))
+        return frame
+
+
+def build_gallery(store_dir, synthetic_identities, index, seed):
+    """Enrolled gallery from the encoding store plus optional synthetic identities."""
+    encodings, names = [], []
+    if store_dir and EncodingStore(store_dir).exists():
+        encodings, names = EncodingStore(store_dir).load()
+        encodings, names = list(encodings), list(names)
+    if synthetic_identities:
+        rng = np.random.default_rng(seed)
+        encodings += list(make_gallery(synthetic_identities, rng))
+        names += [f"synthetic_{i:06d}" for i in range(synthetic_identities)]
+    return FaceGallery(encodings, names, tolerance=0.5, index=index)
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    values = np.asarray(samples) * 1000.0
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(values.mean()), 3),
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def finished_frames(pipeline, capture):
+    """Annotated frames in order, the way the live stream gets them (in-process or via the workers)."""
+    if pipeline.engine is None:
+        while True:
+            success, frame = capture.read()
+            if not success:
+                return
+            yield pipeline.recognize_frame(frame)
+    try:
+        for emitted, frame in enumerate(pipeline.engine.frames(), 1):
+            yield frame
+            if capture.finished and emitted == capture.read_count:
+                return
+    finally:
+        pipeline.engine.stop()
+
+
+def run(pipeline, capture, truth, profile):
+    frame_times = []
+    scored = correct = true_positives = false_positives = false_negatives = 0
+
+    started = last = time.perf_counter()
+    for frame in finished_frames(pipeline, capture):
+        t = time.perf_counter()
+        encode_jpeg(frame, profile)
+        pipeline.timings["jpeg"].append(time.perf_counter() - t)
+        frame_times.append(time.perf_counter() - last)  # Time between delivered frames
+        last = time.perf_counter()
+
+    for key, predicted in pipeline.results:
+        if key in truth:
+            expected = set(truth[key])
+            scored += 1
+            correct += expected == predicted
+            true_positives += len(expected & predicted)
+            false_positives += len(predicted - expected)
+            false_negatives += len(expected - predicted)
+
+    elapsed = time.perf_counter() - started
+    accuracy = None
+    if scored:
+        accuracy = {
+            "frames_scored": scored,
+            "frame_accuracy": round(correct / scored, 4),
+            "precision": round(true_positives / (true_positives + false_positives), 4)
+            if true_positives + false_positives else None,
+            "recall": round(true_positives / (true_positives + false_negatives), 4)
+            if true_positives + false_negatives else None,
+        }
+    return {
+        "frames": len(frame_times),
+        "seconds": round(elapsed, 3),
+        "fps": round(len(frame_times) / elapsed, 2) if elapsed else None,
+        "frame_ms": percentiles(frame_times),
+        "stages_ms": {stage: percentiles(samples) for stage, samples in pipeline.timings.items()},
+        "detected_frames": pipeline.detections,
+        "scaling": pipeline.scaler.stats(),
+        "identities": pipeline.identities.stats(),
+        "peak_rss_mb": peak_rss_mb(),
+        "accuracy": accuracy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="recorded video file to replay")
+    source.add_argument("--images", help="folder of images to replay in name order")
+    parser.add_argument("--truth", help="JSON ground truth: frame index / file name -> list of names")
+    parser.add_argument("--store", default="face_store", help="encoding store folder with the enrolled gallery")
+    parser.add_argument("--synthetic-identities", type=int, default=0, help="add N random identities to the gallery")
+    parser.add_argument("--index", default="exact", help="gallery index: exact, cluster, int8 or float16")
+    parser.add_argument("--fps", type=float, default=0, help="pace the replay like a camera (0 = as fast as possible)")
+    parser.add_argument("--detection-mode", default="gated", choices=("gated", "every_frame"))
+    parser.add_argument("--motion-threshold", type=float, default=0.02)
+    parser.add_argument("--detect-every", type=int, default=15, help="full detection at least every N frames")
+    parser.add_argument("--target-fps", type=float, default=10.0, help="latency budget for the adaptive scaler")
+    parser.add_argument("--detections-per-second", type=float, default=0, help="detection budget (0 = unlimited)")
+    parser.add_argument("--workers", type=int, default=0, help="recognition worker processes (0 = in-process)")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(STREAM_PROFILES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    truth = {}
+    if args.truth:
+        with open(args.truth, "r") as f:
+            truth = {str(key): value for key, value in json.load(f).items()}
+
+    gallery = build_gallery(args.store, args.synthetic_identities, args.index, args.seed)
+    capture = ReplayCapture(replay_frames(args.video, args.images), args.fps)
+    pipeline = TimedPipeline("replay", None, gallery, DetectionScheduler(args.detections_per_second or None),
+                             detection_mode=args.detection_mode, motion_threshold=args.motion_threshold,
+                             detect_every=args.detect_every, target_fps=args.target_fps, workers=args.workers,
+                             max_in_flight=args.max_in_flight, capture=capture)
+    report = run(pipeline, capture, truth, args.profile)
+    report["config"] = {
+        "source": args.video or args.images,
+        "gallery_size": len(gallery),
+        "index": args.index,
+        "fps": args.fps or None,
+        "detection_mode": args.detection_mode,
+        "motion_threshold": args.motion_threshold,
+        "detect_every": args.detect_every,
+        "target_fps": args.target_fps,
+        "detections_per_second": args.detections_per_second or None,
+        "workers": args.workers,
+        "profile": args.profile,
+    }
+
+    output = json.dumps(report, indent=4)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
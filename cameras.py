@@ -0,0 +1,248 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from face_tracking import DetectionGate, FaceTracker, IdentityCache, overlaps
+from frame_budget import AdaptiveScaler
+from recognition_workers import RecognitionEngine
+from video_stream import FrameBroadcaster
+
+
+def detect_faces(rgb_small_frame, upsample=1, reuse_boxes=()):
+    """Run full detection on a downscaled RGB frame; return (locations, encodings).
+
+    Faces overlapping one of reuse_boxes are not encoded; their encoding is None.
+    """
+    import face_recognition  # dlib loads on first use, not whenever app.py imports this module
+    face_locations = face_recognition.face_locations(rgb_small_frame, number_of_times_to_upsample=upsample)
+    new = [i for i, location in enumerate(face_locations) if not overlaps(location, reuse_boxes)]
+    face_encodings = [None] * len(face_locations)
+    for i, encoding in zip(new, face_recognition.face_encodings(rgb_small_frame, [face_locations[i] for i in new])):
+        face_encodings[i] = encoding
+    return face_locations, face_encodings
+
+
+def annotate_frame(frame, small_frame, faces):
+    """Draw boxes and names; faces are in small_frame coordinates and scaled back by the actual ratio."""
+    factor = frame.shape[1] / small_frame.shape[1]
+    for face_location, name in faces:
+        top, right, bottom, left = [int(v * factor) for v in face_location]  # Scale back up
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return frame
+
+
+class LazyCapture:
+    """cv2.VideoCapture that only opens the device on first read, so importing app.py doesn't grab the camera."""
+
+    def __init__(self, source):
+        self.source = source
+        self.capture = None
+        self.lock = threading.Lock()
+
+    def read(self):
+        with self.lock:
+            if self.capture is None:
+                self.capture = cv2.VideoCapture(self.source)
+            return self.capture.read()
+
+    def release(self):
+        with self.lock:
+            if self.capture is not None:
+                self.capture.release()
+                self.capture = None
+
+
+class DetectionScheduler:
+    """Share a global full-detection budget between cameras by priority and recent motion.
+
+    Each camera earns tokens in proportion to priority * motion weight; a
+    detection costs one token. A camera without a token keeps tracking and
+    retries on its next frame. detections_per_second=None disables the limit.
+    """
+
+    def __init__(self, detections_per_second=10.0, burst=2.0):
+        self.rate = detections_per_second
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.cameras = []
+        self.tokens = {}
+        self.last_refill = time.monotonic()
+
+    def register(self, camera):
+        with self.lock:
+            self.cameras.append(camera)
+            self.tokens[camera.name] = self.burst
+
+    @staticmethod
+    def weight(camera):
+        # Quiet rooms still get a trickle; busy ones up to 4x their priority share
+        motion = camera.gate.last_motion / camera.gate.motion_threshold if camera.gate.motion_threshold else 1.0
+        return camera.priority * (0.25 + min(motion, 4.0))
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        weights = {camera.name: self.weight(camera) for camera in self.cameras}
+        total = sum(weights.values()) or 1.0
+        for name, weight in weights.items():
+            self.tokens[name] = min(self.burst, self.tokens[name] + self.rate * elapsed * weight / total)
+
+    def allow(self, camera):
+        """Spend one detection token for camera if it has one."""
+        if not self.rate:
+            return True
+        with self.lock:
+            self._refill()
+            if self.tokens[camera.name] >= 1.0:
+                self.tokens[camera.name] -= 1.0
+                return True
+            return False
+
+    def stats(self):
+        with self.lock:
+            return {name: round(tokens, 2) for name, tokens in self.tokens.items()}
+
+
+class CameraPipeline:
+    """One camera: its own capture, detection gate, tracker, recognized name and video stream.
+
+    All cameras match against the same shared FaceGallery. on_recognized(camera, name)
+    is called whenever the camera's recognized name changes, and on_seen(camera, names)
+    with every known name in view on each frame. capture replaces the camera device
+    (anything with read() and release(), e.g. the benchmark's recorded frames).
+    """
+
+    def __init__(self, name, source, gallery, scheduler, on_recognized, priority=1,
+                 detection_mode="gated", motion_threshold=0.02, detect_every=15,
+                 workers=0, max_in_flight=4, target_fps=10.0, on_seen=None,
+                 reverify_every=45, min_margin=0.08, recent_frames=12, capture=None):
+        self.name = name
+        self.source = source
+        self.priority = priority
+        self.gallery = gallery
+        self.scheduler = scheduler
+        self.on_recognized = on_recognized
+        self.on_seen = on_seen
+        self.detection_mode = detection_mode
+
+        self.capture = capture or LazyCapture(source)
+        self.gate = DetectionGate(motion_threshold, detect_every)
+        self.tracker = FaceTracker()
+        self.identities = IdentityCache(reverify_every, min_margin)
+        self.recent = deque(maxlen=recent_frames)  # Raw (unannotated) frames for picking an enrollment photo
+        self.scaler = AdaptiveScaler(target_fps)
+        self.recognized_name = "Unknown"
+        self.detections = 0
+
+        if workers > 0:
+            # Detection/encoding runs in worker processes; matching and annotation stay here, in frame order
+            self.engine = RecognitionEngine(self.capture, self.prepare_frame, self.finish_frame,
+                                            workers=workers, max_in_flight=max_in_flight,
+                                            record_detection=self.record_detection)
+            self.broadcaster = FrameBroadcaster(self.capture, self.recognize_frame, frame_source=self.engine.frames)
+        else:
+            self.engine = None
+            self.broadcaster = FrameBroadcaster(self.capture, self.recognize_frame)
+        scheduler.register(self)
+
+    def start(self):
+        """Start capturing and recognizing now, whether or not anyone is watching the stream."""
+        self.broadcaster.start()
+
+    def wants_detection(self, small_frame):
+        """Decide whether this frame gets full detection or just tracking."""
+        if self.detection_mode != "every_frame" and not self.gate.should_detect(small_frame):
+            return False
+        if not self.scheduler.allow(self):
+            # Out of budget - keep tracking and ask again on the next frame
+            self.gate.force()
+            return False
+        self.detections += 1
+        return True
+
+    def prepare_frame(self, frame):
+        """Downscale a frame and decide whether and how to run detection on it.
+
+        Returns (small_frame, upsample, reuse_boxes); upsample is None when the frame is
+        only tracked, and reuse_boxes (small_frame coordinates) are the cached tracks whose
+        faces need no encoding. Trackers follow boxes at the current scale, so the scale
+        only changes on a detection.
+        """
+        self.recent.append(frame.copy())  # finish_frame draws on frame in place
+        small_frame = cv2.resize(frame, (0, 0), fx=self.scaler.scale, fy=self.scaler.scale)
+        if not self.wants_detection(small_frame):
+            return small_frame, None, []
+
+        previous_scale = self.scaler.scale
+        scale, upsample = self.scaler.choose(frame.shape)
+        if scale != previous_scale:
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            self.gate.rebase(small_frame)
+        return small_frame, upsample, self.identities.reusable_boxes(small_frame.shape[1] / frame.shape[1])
+
+    def record_detection(self, frame, small_frame, upsample, seconds, face_locations):
+        """Feed a measured detection time and the found face sizes back into the scaler."""
+        factor = frame.shape[1] / small_frame.shape[1]
+        face_heights = [(bottom - top) * factor for top, _, bottom, _ in face_locations]
+        self.scaler.record_detection(frame.shape, small_frame.shape[1] / frame.shape[1], upsample, seconds, face_heights)
+
+    def finish_frame(self, frame, small_frame, detection):
+        """Match or track faces and annotate the frame.
+
+        detection is (locations, encodings) from a full detection, or None to follow
+        the previously recognized boxes with the tracker. Faces whose encoding is None
+        take their name from the identity cache.
+        """
+        started = time.perf_counter()
+        factor = frame.shape[1] / small_frame.shape[1]
+        if detection is not None:
+            faces, missed = self.identities.resolve(self.gallery, *detection, factor)
+            self.tracker.reset(small_frame, faces)
+            if missed:
+                self.gate.force()
+        else:
+            # Nothing much changed - follow the known boxes instead of re-detecting
+            faces, lost = self.tracker.update(small_frame)
+            self.identities.follow(faces, factor)
+            if lost:
+                self.gate.force()
+
+        annotate_frame(frame, small_frame, faces)
+        name = faces[-1][1] if faces else "Unknown"
+
+        if self.on_seen is not None:
+            self.on_seen(self, [face_name for _, face_name in faces])
+        if name != self.recognized_name:
+            self.recognized_name = name
+            self.on_recognized(self, name)
+        self.scaler.record_other(time.perf_counter() - started)
+        return frame
+
+    def recognize_frame(self, frame):
+        """Perform face recognition on one frame in-process (no worker processes)."""
+        small_frame, upsample, reuse_boxes = self.prepare_frame(frame)
+
+        detection = None
+        if upsample is not None:
+            started = time.perf_counter()
+            detection = detect_faces(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB), upsample, reuse_boxes)
+            self.record_detection(frame, small_frame, upsample, time.perf_counter() - started, detection[0])
+        return self.finish_frame(frame, small_frame, detection)
+
+    def recent_frames(self):
+        """The last few raw frames, oldest first (empty until the camera delivers its first frames)."""
+        return list(self.recent)
+
+    def stats(self):
+        report = {"camera": self.name, "priority": self.priority, "recognized_name": self.recognized_name,
+                  "motion": round(self.gate.last_motion, 4), "detections": self.detections}
+        report["scaling"] = self.scaler.stats()
+        report["identities"] = self.identities.stats()
+        report["stream"] = self.broadcaster.stats()
+        if self.engine is not None:
+            report["engine"] = self.engine.stats()
+        return report
@@ -3,38 +3,16 @@ import os
 from datetime import datetime, timedelta
 import pandas as pd
 
+from migrations import migrate
+import visit_rollups
+
 DB_FILE = "patient_database.db"
 CSV_FILE = "people_data.csv"
 
 def create_tables():
-    """Create necessary tables in the database"""
+    """Create necessary tables in the database (same schema as app.py, see migrations.py)"""
     conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # Create patient info table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS patient_info (
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        age INTEGER,
-        medical_history TEXT,
-        last_doctor_visit TEXT,
-        next_medication_time TEXT,
-        family_members TEXT
-    )
-    ''')
-    
-    # Create visit history table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS visit_history (
-        id INTEGER PRIMARY KEY,
-        person_name TEXT,
-        relation TEXT,
-        visit_date TEXT
-    )
-    ''')
-    
-    conn.commit()
+    migrate(conn)
     conn.close()
     print("Database tables created successfully.")
 
@@ -80,6 +58,7 @@ def insert_sample_data():
                     INSERT INTO visit_history (person_name, relation, visit_date)
                     VALUES (?, ?, ?)
                     ''', (row['Name'], row['Relation'], visit_date))
+                    visit_rollups.record(conn, [(row['Name'], visit_date, None)])
                 
                 print(f"Added {len(people_df)} sample visits to history.")
             else:
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+
+# Applied to every new connection. WAL lets readers keep going while the
+# scheduler or the visit writer holds the write lock; NORMAL sync is safe in WAL mode.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-8000",     # 8 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=67108864",   # Read the first 64 MB through mmap
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() rolls back anything uncommitted and returns it to the pool."""
+
+    pool = None
+    released = False
+
+    def close(self):
+        if self.pool is None or self.released:
+            return
+        self.pool.release(self)
+
+    def discard(self):
+        super().close()
+
+
+class Database:
+    """A small pool of long-lived SQLite connections shared by all request and background threads.
+
+    connect() hands out an idle connection (or opens a new one with the WAL
+    pragmas); callers keep using conn.close() as before, which now puts the
+    connection back instead of closing the file. Each connection caches up to
+    cached_statements prepared statements, so repeated queries skip parsing.
+    """
+
+    def __init__(self, path, max_idle=8, timeout=30.0, cached_statements=256):
+        self.path = path
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, factory=PooledConnection,
+                               check_same_thread=False, cached_statements=self.cached_statements)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        with self.lock:
+            self.opened += 1
+        return conn
+
+    def connect(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self._open()
+        conn.released = False
+        return conn
+
+    def release(self, conn):
+        conn.released = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Same as closing: uncommitted work is dropped
+        except sqlite3.Error:
+            conn.discard()
+            return
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.discard()
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.discard()
+
+    def stats(self):
+        with self.lock:
+            return {"opened": self.opened, "idle": len(self.idle)}
@@ -1,46 +1,124 @@
-import cv2
-import face_recognition
-import pickle
+import argparse
+import hashlib
 import os
-import pandas as pd
-from datetime import datetime
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from encoding_store import EncodingStore
 
 # Paths
 KNOWN_FACES_DIR = "known_faces"
 UNKNOWN_FACES_DIR = "unknown_faces"
-ENCODINGS_FILE = "face_encodings.pkl"
+ENCODING_STORE_DIR = "face_store"
+CACHE_FILE = "face_encodings_cache.pkl"  # content hash -> encoding (None if no face was found)
 CSV_FILE = "people_data.csv"
 
-# Ensure directories exist
-os.makedirs(UNKNOWN_FACES_DIR, exist_ok=True)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def file_hash(path):
+    """SHA-1 of the file contents, so renamed or touched files are not re-encoded."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_known_faces(folder=KNOWN_FACES_DIR):
+    """Return (image_path, person_name) for known_faces/<name>/*.jpg and known_faces/<name>.jpg."""
+    images = []
+    if not os.path.isdir(folder):
+        return images
+    for entry in sorted(os.listdir(folder)):
+        path = os.path.join(folder, entry)
+        if os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append((os.path.join(path, filename), entry))
+        elif entry.lower().endswith(IMAGE_EXTENSIONS):
+            # Single photos saved by /add_person as known_faces/<name>.jpg
+            images.append((path, os.path.splitext(entry)[0]))
+    return images
+
+
+def encode_image(image_path):
+    """Worker: encode the first face in an image, or None if no face is found."""
+    import face_recognition  # dlib loads on first use, not whenever app.py imports this module
+    image = face_recognition.load_image_file(image_path)
+    encodings = face_recognition.face_encodings(image)
+    return encodings[0] if encodings else None
+
+
+def load_cache(cache_file=CACHE_FILE):
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable cache {cache_file}: {e}")
+    return {}
+
+
+def save_pickle_atomic(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def rebuild(workers=None, progress_every=25):
+    """Encode only new or changed images, drop deleted ones, and rewrite the encoding store."""
+    os.makedirs(UNKNOWN_FACES_DIR, exist_ok=True)
+
+    images = scan_known_faces()
+    cache = load_cache()
+    hashes = {path: file_hash(path) for path, _ in images}
+    todo = sorted({hashes[path]: path for path, _ in images if hashes[path] not in cache}.items())
+
+    print(f"Found {len(images)} images, {len(images) - len(todo)} cached, {len(todo)} to encode")
+
+    started = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(encode_image, path): (content_hash, path) for content_hash, path in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                content_hash, path = futures[future]
+                try:
+                    cache[content_hash] = future.result()
+                except Exception as e:
+                    print(f"Error encoding {path}: {e}")
+                if done % progress_every == 0 or done == len(todo):
+                    elapsed = time.perf_counter() - started
+                    print(f"  {done}/{len(todo)} encoded ({done / elapsed:.1f} images/s)")
+
+    # Keep only images that still exist; deleted files fall out of both outputs
+    current_hashes = set(hashes.values())
+    cache = {content_hash: encoding for content_hash, encoding in cache.items() if content_hash in current_hashes}
 
-# Load known faces
-if os.path.exists(ENCODINGS_FILE):
-    with open(ENCODINGS_FILE, "rb") as f:
-        data = pickle.load(f)
-        known_encodings, known_names = data.get("encodings", []), data.get("names", [])
-else:
     known_encodings, known_names = [], []
+    for path, person_name in images:
+        encoding = cache.get(hashes[path])
+        if encoding is not None:
+            known_encodings.append(encoding)
+            known_names.append(person_name)
+        elif hashes[path] in cache:
+            print(f"No face found in {path}")
+
+    save_pickle_atomic(CACHE_FILE, cache)
+    EncodingStore(ENCODING_STORE_DIR).rewrite(known_encodings, known_names)
+
+    elapsed = time.perf_counter() - started
+    print("Encodings updated successfully!")
+    print(f"Total Encodings: {len(known_encodings)}")
+    print(f"Names in Encodings: {set(known_names)}")
+    print(f"Encoded {len(todo)} new/changed images in {elapsed:.1f} s")
+    return known_encodings, known_names
+
 
-# Process known faces
-for person_name in os.listdir(KNOWN_FACES_DIR):
-    person_folder = os.path.join(KNOWN_FACES_DIR, person_name)
-    if os.path.isdir(person_folder):
-        for filename in os.listdir(person_folder):
-            if filename.endswith(".jpg") or filename.endswith(".png"):
-                image_path = os.path.join(person_folder, filename)
-                image = face_recognition.load_image_file(image_path)
-                encodings = face_recognition.face_encodings(image)
-
-                if encodings:
-                    encoding = encodings[0]
-                    known_encodings.append(encoding)
-                    known_names.append(person_name)
-
-# Save encodings to file
-with open(ENCODINGS_FILE, "wb") as f:
-    pickle.dump({"encodings": known_encodings, "names": known_names}, f)
-
-print("Encodings updated successfully!")
-print(f"Total Encodings: {len(known_encodings)}")  # Debugging line
-print(f"Names in Encodings: {set(known_names)}")  # Debugging line
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the face encoding store from known_faces/")
+    parser.add_argument("--workers", type=int, default=None, help="encoding processes (default: CPU count)")
+    args = parser.parse_args()
+    rebuild(workers=args.workers)
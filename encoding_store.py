@@ -0,0 +1,183 @@
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+
+ENCODING_SIZE = 128
+FORMAT_NAME = "face-encodings"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+COMPACT_RATIO = 0.25  # Rewrite the data file once this fraction of rows is deleted
+
+
+class EncodingStore:
+    """Face encodings as a raw float32 matrix on disk plus a JSON manifest sidecar.
+
+    The data file is memory-mapped on load, so startup does not copy the
+    gallery. Enrollment appends rows past the committed count and then
+    atomically replaces the manifest; rows beyond the manifest's count are
+    ignored, so a crash mid-append never corrupts the committed gallery.
+    Deletions are tombstones until enough accumulate to compact. Compaction
+    writes a new generation; older data files are deleted once nothing has
+    them mapped, which on Windows may only be at a later load().
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_path = os.path.join(folder, MANIFEST_FILE)
+        self.lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def _read_manifest(self):
+        if not self.exists():
+            return {
+                "format": FORMAT_NAME,
+                "version": FORMAT_VERSION,
+                "dim": ENCODING_SIZE,
+                "dtype": "float32",
+                "generation": 0,
+                "data_file": "encodings.0.f32",
+                "count": 0,
+                "names": [],
+                "deleted": [],
+            }
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported encoding store format in {self.manifest_path}: "
+                             f"{manifest.get('format')} v{manifest.get('version')}")
+        return manifest
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+    def _data_path(self, manifest):
+        return os.path.join(self.folder, manifest["data_file"])
+
+    def _map(self, manifest):
+        """Memory-map the committed rows without reading them into RAM."""
+        if manifest["count"] == 0:
+            return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        return np.memmap(self._data_path(manifest), dtype=np.float32, mode="r",
+                         shape=(manifest["count"], ENCODING_SIZE))
+
+    def _remove_old_generations(self, manifest):
+        """Delete data files the manifest no longer names; ones still mapped (Windows) are left for next time."""
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith("encodings.") and name.endswith(".f32") and name != manifest["data_file"]:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+
+    def load(self):
+        """Return (encodings, names) for live rows; encodings is a zero-copy memmap when nothing is deleted."""
+        with self.lock:
+            manifest = self._read_manifest()
+            self._remove_old_generations(manifest)
+            matrix = self._map(manifest)
+            names = manifest["names"]
+            if manifest["deleted"]:
+                keep = np.ones(manifest["count"], dtype=bool)
+                keep[manifest["deleted"]] = False
+                matrix = np.asarray(matrix[keep])
+                names = [name for name, kept in zip(names, keep) if kept]
+            return matrix, names
+
+    def _append_rows(self, manifest, encodings):
+        rows = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._data_path(manifest)
+        with open(path, "ab") as f:
+            # Drop any rows left behind by an append that never committed
+            f.truncate(manifest["count"] * ENCODING_SIZE * 4)
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return len(rows)
+
+    def append(self, encodings, names):
+        """Append encodings and commit them atomically."""
+        with self.lock:
+            manifest = self._read_manifest()
+            added = self._append_rows(manifest, encodings)
+            manifest["count"] += added
+            manifest["names"] = manifest["names"] + [name.strip() for name in names]
+            self._write_manifest(manifest)
+
+    def replace(self, name, encodings):
+        """Delete all rows for name and append the new encodings in one commit."""
+        name = name.strip()
+        with self.lock:
+            manifest = self._read_manifest()
+            deleted = set(manifest["deleted"])
+            deleted.update(i for i, n in enumerate(manifest["names"]) if n == name)
+            added = self._append_rows(manifest, encodings)
+            manifest["count"] += added
+            manifest["names"] = manifest["names"] + [name] * added
+            manifest["deleted"] = sorted(deleted)
+            self._write_manifest(manifest)
+            self._maybe_compact(manifest)
+
+    def delete(self, name):
+        """Tombstone all rows for name; returns how many were removed."""
+        name = name.strip()
+        with self.lock:
+            manifest = self._read_manifest()
+            deleted = set(manifest["deleted"])
+            rows = {i for i, n in enumerate(manifest["names"]) if n == name} - deleted
+            if rows:
+                manifest["deleted"] = sorted(deleted | rows)
+                self._write_manifest(manifest)
+                self._maybe_compact(manifest)
+            return len(rows)
+
+    def _rewrite(self, manifest, encodings, names):
+        """Write a fresh data file under a new generation and switch the manifest to it."""
+        generation = manifest["generation"] + 1
+        manifest = dict(manifest, generation=generation, data_file=f"encodings.{generation}.f32",
+                        count=0, names=[], deleted=[])
+        # Always create the data file, even empty, so the manifest never names a missing file
+        added = self._append_rows(manifest, encodings if len(names) else np.empty((0, ENCODING_SIZE), np.float32))
+        manifest["count"] = added
+        manifest["names"] = [name.strip() for name in names]
+        self._write_manifest(manifest)
+        # The live gallery may still map the old file: POSIX lets it go on reading it, Windows refuses the delete
+        self._remove_old_generations(manifest)
+        return manifest
+
+    def _maybe_compact(self, manifest):
+        if manifest["count"] and len(manifest["deleted"]) / manifest["count"] >= COMPACT_RATIO:
+            keep = np.ones(manifest["count"], dtype=bool)
+            keep[manifest["deleted"]] = False
+            matrix = np.array(self._map(manifest)[keep])
+            names = [name for name, kept in zip(manifest["names"], keep) if kept]
+            self._rewrite(manifest, matrix, names)
+
+    def rewrite(self, encodings, names):
+        """Replace the whole gallery atomically (used by encode_faces.py rebuilds)."""
+        with self.lock:
+            self._rewrite(self._read_manifest(), encodings, names)
+
+    def migrate_from_pickle(self, pickle_path):
+        """One-shot import of a legacy face_encodings.pkl; returns the number of encodings imported."""
+        with open(pickle_path, "rb") as f:
+            data = pickle.load(f)
+        encodings, names = data.get("encodings", []), data.get("names", [])
+        self.rewrite(encodings, names)
+        print(f"Migrated {len(names)} encodings from {pickle_path} to {self.folder}")
+        return len(names)
@@ -0,0 +1,134 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from encode_faces import encode_image
+
+ENROLLMENT_MODES = ("multi", "centroid")
+
+
+class EnrollmentQueue:
+    """Enroll people in the background: encode their photos in parallel, then update gallery and store.
+
+    submit() returns a job id right away; jobs run one at a time on a worker
+    thread while the photos of a job are encoded in parallel by a process pool
+    (a thread pool where processes can't be forked, e.g. on Windows).
+    In "multi" mode every photo with a face becomes one gallery embedding, in
+    "centroid" mode their mean does. The live gallery swaps the person's
+    encodings in one step (FaceGallery.replace), so the video pipeline never
+    waits on detection or file I/O. on_enrolled(job, image_paths) files the
+    photos and person details once encoding succeeds, before the store and
+    gallery change (if it raises, the job fails and they are left untouched);
+    on_update(job) runs after every status change.
+    """
+
+    def __init__(self, gallery, store, workers=2, mode="multi", on_enrolled=None, on_update=None, history=100):
+        if mode not in ENROLLMENT_MODES:
+            raise ValueError(f"Unknown enrollment mode {mode!r}; expected one of {ENROLLMENT_MODES}")
+        self.gallery = gallery
+        self.store = store
+        self.workers = workers
+        self.mode = mode
+        self.on_enrolled = on_enrolled
+        self.on_update = on_update
+        self.history = history
+        self.jobs = OrderedDict()  # job id -> status dict, oldest first
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.pool = None
+        self.thread = threading.Thread(target=self._run, name="enrollment", daemon=True)
+        self.thread.start()
+
+    def submit(self, name, image_paths, details=None):
+        """Queue an enrollment; returns the job id."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "name": name.strip(),
+            "status": "queued",
+            "images": len(image_paths),
+            "faces": 0,
+            "embeddings": 0,
+            "error": None,
+            "submitted": time.time(),
+            "finished": None,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+        self._notify(job)
+        self.pending.put((job_id, list(image_paths), details or {}))
+        return job_id
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _set(self, job_id, **changes):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(changes)
+            job = dict(job)
+        self._notify(job)
+        return job
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(dict(job))
+            except Exception as e:
+                print(f"Error reporting enrollment status: {e}")
+
+    def _encode(self, image_paths):
+        if self.pool is None:
+            if "fork" in mp.get_all_start_methods():
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("fork"))
+            else:
+                # A spawned child re-imports __main__ (app.py or serve.py) and would start the whole app again
+                self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        return list(self.pool.map(encode_image, image_paths))
+
+    def _run(self):
+        while True:
+            job_id, image_paths, details = self.pending.get()
+            if job_id is None:
+                break
+            job = self._set(job_id, status="encoding")
+            if job is None:
+                continue
+            try:
+                encodings = [encoding for encoding in self._encode(image_paths) if encoding is not None]
+                faces = len(encodings)
+                if not encodings:
+                    self._set(job_id, status="failed", finished=time.time(),
+                              error="No face detected in the image. Please try capturing again.")
+                    continue
+
+                if self.mode == "centroid":
+                    encodings = [np.mean(np.asarray(encodings, dtype=np.float64), axis=0)]
+                # Photos and details first: if filing them fails, gallery and store stay as they were
+                if self.on_enrolled is not None:
+                    self.on_enrolled(dict(job, details=details), image_paths)
+                # Persist before the live gallery, so it never holds encodings that a restart would lose
+                self.store.replace(job["name"], encodings)
+                self.gallery.replace(job["name"], encodings)
+                self._set(job_id, status="done", faces=faces, embeddings=len(encodings), finished=time.time())
+                print(f"Enrolled {job['name']}: {faces} face(s) in {len(image_paths)} image(s), {len(encodings)} embedding(s)")
+            except Exception as e:
+                print(f"Error enrolling {job['name']}: {e}")
+                self._set(job_id, status="failed", error=str(e), finished=time.time())
+
+    def stop(self):
+        self.pending.put((None, None, None))
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
@@ -0,0 +1,89 @@
+import json
+import threading
+from collections import deque
+
+
+class EventBus:
+    """Fan out server-sent events (SSE) to any number of connected browsers.
+
+    Every published event gets an increasing id and is formatted once into its
+    SSE wire form; a bounded history lets a reconnecting client resume from its
+    Last-Event-ID. Clients share one condition variable, so publishing costs
+    the same whether one or fifty browsers are connected.
+    """
+
+    def __init__(self, history=256, keepalive=15.0):
+        self.events = deque(maxlen=history)  # (event_id, payload)
+        self.condition = threading.Condition()
+        self.last_id = 0
+        self.keepalive = keepalive
+        self.clients = 0
+
+    def publish(self, event_type, data):
+        """Queue one event for every client; data must be JSON serializable."""
+        with self.condition:
+            self.last_id += 1
+            payload = self.format(self.last_id, event_type, data)
+            self.events.append((self.last_id, payload))
+            self.condition.notify_all()
+        return self.last_id
+
+    def since(self, last_id):
+        """(event_id, payload) pairs newer than last_id, or None when resuming is impossible.
+
+        That is when the events after last_id were already dropped from the history,
+        or last_id is from before a server restart (ahead of our counter).
+        """
+        with self.condition:
+            if last_id > self.last_id or (self.events and last_id < self.events[0][0] - 1):
+                return None
+            return [(event_id, payload) for event_id, payload in self.events if event_id > last_id]
+
+    @staticmethod
+    def format(event_id, event_type, data):
+        return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+    def stream(self, last_event_id=None, snapshot=None):
+        """Yield SSE payloads for one client.
+
+        last_event_id resumes after that event. A new client, or one whose
+        event was already dropped from the history, first gets the
+        (event_type, data) pairs from snapshot() so it starts from the current
+        state; they carry the current event id so the client resumes from there.
+        """
+        try:
+            last_id = int(last_event_id)
+        except (TypeError, ValueError):
+            last_id = None
+
+        with self.condition:
+            self.clients += 1
+        try:
+            missed = self.since(last_id) if last_id is not None else None
+            if missed is None:
+                with self.condition:
+                    last_id = self.last_id
+                for event_type, data in snapshot() if snapshot else []:
+                    yield self.format(last_id, event_type, data)
+            else:
+                for event_id, payload in missed:
+                    last_id = event_id
+                    yield payload
+
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.last_id > last_id, timeout=self.keepalive)
+                    fresh = [(event_id, payload) for event_id, payload in self.events if event_id > last_id]
+                if not fresh:
+                    yield ": keepalive\n\n"  # Comment line keeps proxies from closing an idle stream
+                    continue
+                for event_id, payload in fresh:
+                    last_id = event_id
+                    yield payload
+        finally:
+            with self.condition:
+                self.clients -= 1
+
+    def stats(self):
+        with self.condition:
+            return {"clients": self.clients, "last_event_id": self.last_id, "buffered": len(self.events)}
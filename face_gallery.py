@@ -0,0 +1,97 @@
+import threading
+
+import numpy as np
+
+from face_index import create_index
+
+
+class FaceGallery:
+    """Known identities behind a pluggable nearest-neighbour index.
+
+    The index ("exact", "cluster", "int8" or "float16", see face_index.py) stores
+    the encodings under integer ids; the gallery maps those ids back to names.
+    """
+
+    def __init__(self, encodings=None, names=None, tolerance=0.5, index="exact"):
+        self.tolerance = tolerance
+        self.lock = threading.Lock()
+        self.index = create_index(index) if isinstance(index, str) else index
+        self.labels = {}  # entry id -> name
+        self.ids_by_name = {}  # name -> [entry ids]
+        self.next_id = 0
+        if names:
+            self.add_many(encodings, names)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def snapshot(self):
+        """Return (encodings, names) in insertion order, e.g. for persisting the gallery."""
+        with self.lock:
+            ids, vectors = self.index.reconstruct()
+            order = np.argsort(ids)
+            return vectors[order], [self.labels[int(i)] for i in ids[order]]
+
+    @property
+    def encodings(self):
+        return self.snapshot()[0]
+
+    @property
+    def names(self):
+        return self.snapshot()[1]
+
+    def _add_locked(self, encodings, names):
+        ids = list(range(self.next_id, self.next_id + len(names)))
+        self.next_id += len(names)
+        self.index.add(ids, encodings)
+        for entry_id, name in zip(ids, names):
+            name = name.strip()
+            self.labels[entry_id] = name
+            self.ids_by_name.setdefault(name, []).append(entry_id)
+        return ids
+
+    def _remove_locked(self, name):
+        ids = self.ids_by_name.pop(name, [])
+        if ids:
+            self.index.remove(ids)
+            for entry_id in ids:
+                del self.labels[entry_id]
+        return len(ids)
+
+    def add_many(self, encodings, names):
+        """Insert several encodings at once; returns their entry ids."""
+        with self.lock:
+            return self._add_locked(encodings, names)
+
+    def add(self, encoding, name):
+        """Append one encoding for name."""
+        return self.add_many([encoding], [name])[0]
+
+    def remove(self, name):
+        """Drop every encoding stored for name; return how many were removed."""
+        with self.lock:
+            return self._remove_locked(name.strip())
+
+    def replace(self, name, encodings):
+        """Swap all of name's encodings for new ones in one step, so matching never sees them half-updated."""
+        name = name.strip()
+        with self.lock:
+            self._remove_locked(name)
+            return self._add_locked(encodings, [name] * len(encodings))
+
+    def match(self, face_encodings):
+        """Match every face in a frame against the gallery in one batched search.
+
+        Returns one (entry_id, distance, accepted, name) tuple per face;
+        entry_id is -1 and name is "Unknown" when nothing is enrolled.
+        """
+        if len(face_encodings) == 0:
+            return []
+        with self.lock:
+            best_ids, distances = self.index.search(face_encodings)
+            results = []
+            for entry_id, distance in zip(best_ids, distances):
+                accepted = bool(entry_id >= 0 and distance <= self.tolerance)
+                name = self.labels[int(entry_id)] if accepted else "Unknown"
+                results.append((int(entry_id), float(distance), accepted, name))
+            return results
@@ -0,0 +1,233 @@
+import numpy as np
+
+ENCODING_SIZE = 128  # face_recognition produces 128-d embeddings
+SEARCH_CHUNK = 8192  # Rows scored per block so quantized scans never expand the whole matrix
+
+
+def as_matrix(vectors):
+    """Return vectors as a contiguous (n, 128) float32 matrix."""
+    if vectors is None or len(vectors) == 0:
+        return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+    return np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+
+
+def squared_norms(matrix):
+    return np.einsum('ij,ij->i', matrix, matrix)
+
+
+class BruteForceIndex:
+    """Exact linear scan over one contiguous float32 matrix with a parallel ids array."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, vectors):
+        vectors = as_matrix(vectors)
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        if len(self.matrix) == 0:
+            # Adopt the first batch as-is, e.g. a read-only memmap from the encoding store
+            self.matrix = vectors
+        else:
+            self.matrix = np.concatenate([self.matrix, vectors])
+        self.norms = np.concatenate([self.norms, squared_norms(vectors)])
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        self.ids = self.ids[keep]
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self.norms = self.norms[keep]
+
+    def reconstruct(self):
+        """Return (ids, float32 vectors) for every stored entry."""
+        return self.ids.copy(), self.matrix.copy()
+
+    def search(self, queries):
+        """Return (best_ids, distances) of the nearest entry for each query."""
+        queries = as_matrix(queries)
+        if len(self.ids) == 0:
+            return np.full(len(queries), -1, dtype=np.int64), np.full(len(queries), np.inf, dtype=np.float32)
+        squared = squared_norms(queries)[:, None] + self.norms[None, :] - 2.0 * (queries @ self.matrix.T)
+        best = np.argmin(squared, axis=1)
+        distances = np.sqrt(np.maximum(squared[np.arange(len(queries)), best], 0.0))
+        return self.ids[best], distances
+
+
+class QuantizedIndex:
+    """Linear scan over float16 or int8 codes - 2x/4x smaller than float32 at a small accuracy cost."""
+
+    def __init__(self, dtype="int8", value_range=0.6):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unsupported quantization dtype: {dtype}")
+        self.dtype = np.dtype(dtype)
+        # face_recognition encodings stay well inside +/-0.6; values outside are clipped
+        self.scale = value_range / 127.0 if dtype == "int8" else 1.0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.codes = np.empty((0, ENCODING_SIZE), dtype=self.dtype)
+        self.norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _encode(self, vectors):
+        if self.dtype == np.int8:
+            return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        return vectors.astype(np.float16)
+
+    def _decode(self, codes):
+        return codes.astype(np.float32) * self.scale
+
+    def add(self, ids, vectors):
+        codes = self._encode(as_matrix(vectors))
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.codes = np.concatenate([self.codes, codes])
+        # Norms of the decoded vectors keep distances consistent with what is stored
+        self.norms = np.concatenate([self.norms, squared_norms(self._decode(codes))])
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        self.ids = self.ids[keep]
+        self.codes = np.ascontiguousarray(self.codes[keep])
+        self.norms = self.norms[keep]
+
+    def reconstruct(self):
+        return self.ids.copy(), self._decode(self.codes)
+
+    def search(self, queries):
+        queries = as_matrix(queries)
+        count = len(queries)
+        best_ids = np.full(count, -1, dtype=np.int64)
+        best_squared = np.full(count, np.inf, dtype=np.float32)
+        if len(self.ids) == 0:
+            return best_ids, best_squared
+
+        query_norms = squared_norms(queries)
+        scaled_queries = (queries * self.scale).T
+        rows = np.arange(count)
+        for start in range(0, len(self.ids), SEARCH_CHUNK):
+            block = self.codes[start:start + SEARCH_CHUNK].astype(np.float32)
+            squared = query_norms[:, None] + self.norms[None, start:start + SEARCH_CHUNK] - 2.0 * (block @ scaled_queries).T
+            best = np.argmin(squared, axis=1)
+            block_best = squared[rows, best]
+            better = block_best < best_squared
+            best_squared[better] = block_best[better]
+            best_ids[better] = self.ids[start + best[better]]
+        return best_ids, np.sqrt(np.maximum(best_squared, 0.0))
+
+
+class ClusterIndex:
+    """Inverted-file index: k-means partitions, searching only the nprobe closest clusters.
+
+    Until min_train entries exist it behaves like a brute-force scan. It retrains
+    itself when the gallery has grown retrain_factor times since the last training.
+    """
+
+    def __init__(self, nprobe=4, min_train=1024, retrain_factor=4, iterations=10, seed=0):
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_factor = retrain_factor
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self.trained_size = 0
+        self.lists = []          # One BruteForceIndex per cluster
+        self.assignment = {}     # id -> cluster number
+        self.pending = BruteForceIndex()  # Entries held until the first training
+
+    def __len__(self):
+        return len(self.assignment) + len(self.pending)
+
+    def _nearest_centroids(self, vectors, count):
+        squared = squared_norms(vectors)[:, None] + squared_norms(self.centroids)[None, :] - 2.0 * (vectors @ self.centroids.T)
+        if count >= len(self.centroids):
+            return np.argsort(squared, axis=1)
+        return np.argpartition(squared, count, axis=1)[:, :count]
+
+    def _train(self):
+        ids, vectors = self.reconstruct()
+        clusters = max(1, int(np.sqrt(len(ids))))
+        self.centroids = vectors[self.rng.choice(len(vectors), clusters, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = self._nearest_centroids(vectors, 1)[:, 0]
+            for cluster in range(clusters):
+                members = vectors[labels == cluster]
+                if len(members):
+                    self.centroids[cluster] = members.mean(axis=0)
+
+        self.lists = [BruteForceIndex() for _ in range(clusters)]
+        self.assignment = {}
+        self.pending = BruteForceIndex()
+        self.trained_size = len(ids)
+        self._assign(ids, vectors)
+
+    def _assign(self, ids, vectors):
+        labels = self._nearest_centroids(vectors, 1)[:, 0]
+        for cluster in np.unique(labels):
+            members = labels == cluster
+            self.lists[cluster].add(ids[members], vectors[members])
+            for entry_id in ids[members]:
+                self.assignment[int(entry_id)] = int(cluster)
+
+    def add(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = as_matrix(vectors)
+        if self.centroids is None:
+            self.pending.add(ids, vectors)
+            if len(self.pending) >= self.min_train:
+                self._train()
+            return
+        self._assign(ids, vectors)
+        if len(self.assignment) >= self.trained_size * self.retrain_factor:
+            self._train()
+
+    def remove(self, ids):
+        ids = list(ids)
+        if self.centroids is None:
+            self.pending.remove(ids)
+            return
+        by_cluster = {}
+        for entry_id in ids:
+            cluster = self.assignment.pop(int(entry_id), None)
+            if cluster is not None:
+                by_cluster.setdefault(cluster, []).append(entry_id)
+        for cluster, cluster_ids in by_cluster.items():
+            self.lists[cluster].remove(cluster_ids)
+
+    def reconstruct(self):
+        parts = [self.pending.reconstruct()] + [entries.reconstruct() for entries in self.lists]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def search(self, queries):
+        queries = as_matrix(queries)
+        if self.centroids is None:
+            return self.pending.search(queries)
+
+        best_ids = np.full(len(queries), -1, dtype=np.int64)
+        best_distances = np.full(len(queries), np.inf, dtype=np.float32)
+        probes = self._nearest_centroids(queries, self.nprobe)[:, :self.nprobe]
+        for row, clusters in enumerate(probes):
+            query = queries[row:row + 1]
+            for cluster in clusters:
+                entry_ids, distances = self.lists[cluster].search(query)
+                if distances[0] < best_distances[row]:
+                    best_ids[row], best_distances[row] = entry_ids[0], distances[0]
+        return best_ids, best_distances
+
+
+INDEX_TYPES = {
+    "exact": BruteForceIndex,
+    "cluster": ClusterIndex,
+    "int8": lambda: QuantizedIndex("int8"),
+    "float16": lambda: QuantizedIndex("float16"),
+}
+
+
+def create_index(kind="exact"):
+    """Build one of the registered index types by name."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown face index type: {kind}")
+    return INDEX_TYPES[kind]()
@@ -0,0 +1,99 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def write_json_atomic(file_path, data):
+    """Write JSON to a temp file in the same folder and rename it over the target."""
+    folder = os.path.dirname(file_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class FaceMemoryStore:
+    """In-memory face memory (e.g. last_seen) persisted only on change, at most once per interval."""
+
+    def __init__(self, file_path, data, write_interval=2.0):
+        self.file_path = file_path
+        self.data = dict(data)
+        self.write_interval = write_interval
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.dirty = False
+        self.writes = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="face-memory-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.data.get(key, default)
+
+    def snapshot(self):
+        """Return a copy of the current in-memory state."""
+        with self.lock:
+            return dict(self.data)
+
+    def update(self, **changes):
+        """Apply changes; schedule a write only if a value actually changed."""
+        with self.lock:
+            if all(self.data.get(key) == value for key, value in changes.items()):
+                return False
+            self.data.update(changes)
+            self.dirty = True
+        self.changed.set()
+        return True
+
+    def update_entry(self, key, entry, value, **changes):
+        """Set data[key][entry] = value plus any top-level changes in one step, like update()."""
+        with self.lock:
+            current = self.data.get(key) or {}
+            if current.get(entry) == value and all(self.data.get(k) == v for k, v in changes.items()):
+                return False
+            self.data[key] = dict(current, **{entry: value})
+            self.data.update(changes)
+            self.dirty = True
+        self.changed.set()
+        return True
+
+    def flush(self):
+        """Write the current state now if it has unsaved changes."""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = dict(self.data)
+            self.dirty = False
+        try:
+            write_json_atomic(self.file_path, data)
+            self.writes += 1
+        except Exception as e:
+            print(f"Error saving {self.file_path}: {e}")
+            with self.lock:
+                self.dirty = True
+            self.changed.set()
+
+    def _run(self):
+        while self.running:
+            self.changed.wait()
+            self.changed.clear()
+            self.flush()
+            # Coalesce: further changes during this pause go out in a single write
+            time.sleep(self.write_interval)
+
+    def close(self):
+        self.running = False
+        self.changed.set()
+        self.flush()
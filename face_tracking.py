@@ -0,0 +1,216 @@
+import threading
+
+import cv2
+
+TRACK_MIN_IOU = 0.5  # Overlap at which a detected box counts as the same track
+
+
+class DetectionGate:
+    """Decide when a frame needs full face detection instead of cheap tracking."""
+
+    def __init__(self, motion_threshold=0.02, detect_every=15, pixel_threshold=25):
+        self.motion_threshold = motion_threshold  # Fraction of pixels that must change
+        self.detect_every = detect_every          # Force a detection at least every N frames
+        self.pixel_threshold = pixel_threshold    # Per-pixel grey-level change counted as motion
+        self.previous_gray = None
+        self.last_motion = 0.0
+        self.frames_since_detection = None
+        self.forced = True
+
+    def force(self):
+        """Run full detection on the next frame (e.g. after a tracker lost its face)."""
+        self.forced = True
+
+    def rebase(self, small_frame):
+        """Use small_frame as the motion reference (after the downscale factor changed)."""
+        gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+        self.previous_gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def motion_ratio(self, gray):
+        """Return the fraction of pixels that changed since the previous frame."""
+        if self.previous_gray is None or self.previous_gray.shape != gray.shape:
+            return 1.0
+        diff = cv2.absdiff(gray, self.previous_gray)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def should_detect(self, small_frame):
+        """Return True when motion crossed the threshold or the detection interval elapsed."""
+        gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        motion = self.motion_ratio(gray)
+        self.previous_gray = gray
+        self.last_motion = motion
+
+        due = (
+            self.forced
+            or self.frames_since_detection is None
+            or self.frames_since_detection + 1 >= self.detect_every
+            or motion >= self.motion_threshold
+        )
+        if due:
+            self.forced = False
+            self.frames_since_detection = 0
+        else:
+            self.frames_since_detection += 1
+        return due
+
+
+def create_tracker():
+    """Create the cheapest OpenCV tracker available in this build."""
+    factories = [
+        getattr(getattr(cv2, "legacy", None), "TrackerMOSSE_create", None),
+        getattr(cv2, "TrackerKCF_create", None),
+        getattr(getattr(cv2, "legacy", None), "TrackerKCF_create", None),
+        getattr(cv2, "TrackerMIL_create", None),
+    ]
+    for factory in factories:
+        if factory is not None:
+            return factory()
+    return None
+
+
+class FaceTracker:
+    """Follow recognized face boxes between full detections."""
+
+    def __init__(self):
+        self.tracks = []  # list of (tracker, name)
+
+    def reset(self, frame, faces):
+        """Start a tracker for every (location, name) pair found by full detection."""
+        self.tracks = []
+        frame_height, frame_width = frame.shape[:2]
+        for (top, right, bottom, left), name in faces:
+            tracker = create_tracker()
+            if tracker is None:
+                continue
+            x, y = max(left, 0), max(top, 0)
+            w, h = min(right, frame_width) - x, min(bottom, frame_height) - y
+            if w <= 0 or h <= 0:
+                continue
+            tracker.init(frame, (int(x), int(y), int(w), int(h)))
+            self.tracks.append((tracker, name))
+
+    def update(self, frame):
+        """Advance all trackers; return surviving (location, name) pairs and whether any were lost."""
+        faces = []
+        survivors = []
+        for tracker, name in self.tracks:
+            ok, (x, y, w, h) = tracker.update(frame)
+            if not ok:
+                continue
+            x, y, w, h = int(x), int(y), int(w), int(h)
+            faces.append(((y, x + w, y + h, x), name))
+            survivors.append((tracker, name))
+        lost = len(survivors) < len(self.tracks)
+        self.tracks = survivors
+        return faces, lost
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def scale_box(box, factor):
+    return tuple(int(round(v * factor)) for v in box)
+
+
+def overlaps(box, boxes, min_iou=TRACK_MIN_IOU):
+    return any(box_iou(box, other) >= min_iou for other in boxes)
+
+
+class IdentityCache:
+    """Remember who each tracked face is so a re-detected face can skip face_encodings.
+
+    A face found again where a confidently recognized track already is keeps that
+    track's name. A track is re-verified (encoded and matched again) once it is
+    reverify_every frames old, and never reused when its match margin
+    (tolerance - distance) was below min_margin. New faces and boxes that jumped
+    (IoU below TRACK_MIN_IOU) are always encoded. Boxes are kept in full-resolution
+    pixels so a change of detection scale doesn't invalidate the cache.
+    """
+
+    def __init__(self, reverify_every=45, min_margin=0.08):
+        self.reverify_every = reverify_every
+        self.min_margin = min_margin
+        self.lock = threading.Lock()
+        self.tracks = []  # dicts: box, name, margin, age (frames since last verified)
+        self.encoded = 0
+        self.reused = 0
+
+    def reusable_boxes(self, factor=1.0):
+        """Boxes (scaled by factor) whose identity can be reused without encoding."""
+        with self.lock:
+            return [scale_box(track["box"], factor) for track in self.tracks
+                    if track["margin"] >= self.min_margin and track["age"] < self.reverify_every]
+
+    def _find(self, box):
+        best, best_iou = None, TRACK_MIN_IOU
+        for track in self.tracks:
+            iou = box_iou(box, track["box"])
+            if iou >= best_iou:
+                best, best_iou = track, iou
+        return best
+
+    def resolve(self, gallery, face_locations, face_encodings, factor=1.0):
+        """Turn a detection into (location, name) pairs and refresh the cached tracks.
+
+        face_encodings holds None for faces that were not encoded because a
+        reusable track covered them. Returns (faces, missed); missed is True when
+        such a face no longer had a track (e.g. the cache changed meanwhile).
+        """
+        encoded = [encoding for encoding in face_encodings if encoding is not None]
+        matches = iter(gallery.match(encoded))
+        faces, tracks, missed = [], [], False
+        with self.lock:
+            for face_location, encoding in zip(face_locations, face_encodings):
+                box = scale_box(face_location, factor)
+                if encoding is None:
+                    track = self._find(box)
+                    if track is None:
+                        missed = True
+                        continue
+                    self.reused += 1
+                    tracks.append(dict(track, box=box, age=track["age"] + 1))
+                    faces.append((face_location, track["name"]))
+                    continue
+
+                self.encoded += 1
+                _, distance, accepted, name = next(matches)
+                if accepted:
+                    tracks.append({"box": box, "name": name, "margin": gallery.tolerance - distance, "age": 0})
+                    faces.append((face_location, name))
+            self.tracks = tracks
+        return faces, missed
+
+    def follow(self, faces, factor=1.0):
+        """Move cached tracks along with the tracker's boxes between detections."""
+        with self.lock:
+            moved = {}
+            for face_location, name in faces:
+                moved.setdefault(name, []).append(scale_box(face_location, factor))
+            survivors = []
+            for track in self.tracks:
+                candidates = moved.get(track["name"])
+                if candidates:
+                    box = max(candidates, key=lambda candidate: box_iou(candidate, track["box"]))
+                    survivors.append(dict(track, box=box, age=track["age"] + 1))
+            self.tracks = survivors
+
+    def stats(self):
+        with self.lock:
+            total = self.encoded + self.reused
+            return {
+                "tracks": len(self.tracks),
+                "encoded": self.encoded,
+                "reused": self.reused,
+                "reuse_ratio": round(self.reused / total, 3) if total else None,
+            }
@@ -0,0 +1,91 @@
+from collections import deque
+
+SCALE_STEPS = (0.125, 0.25, 0.5, 1.0)
+UPSAMPLE_STEPS = (0, 1, 2)
+HOG_MIN_FACE = 80  # Smallest face height (px) the HOG detector finds without upsampling
+
+
+class AdaptiveScaler:
+    """Pick the detection downscale factor and upsampling from a per-frame latency budget.
+
+    Detection cost is modelled as proportional to the number of pixels the HOG
+    detector scans (frame area * scale^2 * 4^upsample) and calibrated from
+    measured detection times. Among the settings predicted to fit the budget,
+    the cheapest one that can still see the smallest recently seen face wins.
+    When no face was seen lately it assumes a distant face of distant_face_px.
+    """
+
+    def __init__(self, target_fps=10.0, scale=0.25, upsample=1, distant_face_px=120, history=8, alpha=0.2):
+        self.budget_ms = 1000.0 / target_fps
+        self.scale = scale
+        self.upsample = upsample
+        self.distant_face_px = distant_face_px
+        self.alpha = alpha
+        self.face_sizes = deque(maxlen=history)  # Smallest face height per detection (full-res px), or None
+        self.ms_per_pixel = None  # EWMA of detection time per scanned pixel
+        self.other_ms = 0.0       # EWMA of everything but detection (resize, track, draw)
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    @staticmethod
+    def scanned_pixels(frame_shape, scale, upsample):
+        height, width = frame_shape[:2]
+        return height * width * scale * scale * (4 ** upsample)
+
+    def predicted_ms(self, frame_shape, scale, upsample):
+        if self.ms_per_pixel is None:
+            return 0.0
+        return self.ms_per_pixel * self.scanned_pixels(frame_shape, scale, upsample)
+
+    def record_detection(self, frame_shape, scale, upsample, seconds, face_heights):
+        """Calibrate from one detection; face_heights are in full-resolution pixels."""
+        pixels = self.scanned_pixels(frame_shape, scale, upsample)
+        if pixels:
+            self.ms_per_pixel = self._ewma(self.ms_per_pixel, seconds * 1000.0 / pixels)
+        self.face_sizes.append(min(face_heights) if face_heights else None)
+
+    def record_other(self, seconds):
+        self.other_ms = self._ewma(self.other_ms, seconds * 1000.0)
+
+    def needed_face_px(self):
+        sizes = [size for size in self.face_sizes if size is not None]
+        return min(sizes) if sizes else self.distant_face_px
+
+    def choose(self, frame_shape):
+        """Return the (scale, upsample) to use for the next detection and remember it."""
+        if self.ms_per_pixel is None:
+            return self.scale, self.upsample  # Not calibrated yet - keep the starting setting
+
+        detection_budget = max(self.budget_ms - self.other_ms, 0.0)
+        needed = self.needed_face_px()
+
+        options = sorted(
+            ((scale, upsample) for scale in SCALE_STEPS for upsample in UPSAMPLE_STEPS),
+            # Equal cost: prefer real pixels (larger scale) over upsampled ones
+            key=lambda option: (self.scanned_pixels(frame_shape, *option), -option[0]),
+        )
+        fitting = [option for option in options if self.predicted_ms(frame_shape, *option) <= detection_budget]
+        if not fitting:
+            fitting = options[:1]
+
+        def sees(option):
+            scale, upsample = option
+            return needed * scale * (2 ** upsample) >= HOG_MIN_FACE
+
+        seeing = [option for option in fitting if sees(option)]
+        # Cheapest setting that still sees the face, else the most detailed one we can afford
+        self.scale, self.upsample = seeing[0] if seeing else fitting[-1]
+        return self.scale, self.upsample
+
+    def stats(self, frame_shape=None):
+        report = {
+            "scale": self.scale,
+            "upsample": self.upsample,
+            "budget_ms": round(self.budget_ms, 1),
+            "other_ms": round(self.other_ms, 2),
+            "needed_face_px": self.needed_face_px(),
+        }
+        if frame_shape is not None:
+            report["predicted_detection_ms"] = round(self.predicted_ms(frame_shape, self.scale, self.upsample), 2)
+        return report
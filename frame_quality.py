@@ -0,0 +1,69 @@
+import math
+
+import cv2
+
+SHARPEST_CANDIDATES = 4  # Frames that get face detection after the cheap sharpness pre-filter
+DETECTION_WIDTH = 640    # Frames are scored at this width at most
+
+
+def sharpness(gray):
+    """Variance of the Laplacian: high for crisp edges, low for motion blur or defocus."""
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def detect_with_scores(rgb_image):
+    """Face boxes (top, right, bottom, left) with the HOG detector's confidence for each.
+
+    Uses dlib's scored detector behind face_recognition when it is reachable;
+    otherwise every face found gets confidence 1.0.
+    """
+    import face_recognition  # dlib loads on first use, not whenever app.py imports this module
+    detector = getattr(getattr(face_recognition, "api", None), "face_detector", None)
+    if detector is not None and hasattr(detector, "run"):
+        rects, scores, _ = detector.run(rgb_image, 1, 0)
+        return [((rect.top(), rect.right(), rect.bottom(), rect.left()), score) for rect, score in zip(rects, scores)]
+    return [(location, 1.0) for location in face_recognition.face_locations(rgb_image)]
+
+
+def score_frame(frame):
+    """Score a frame for enrollment from its largest face: size x face sharpness x detector confidence.
+
+    Returns (score, details); score is 0 when no face is found.
+    """
+    scale = min(1.0, DETECTION_WIDTH / frame.shape[1])
+    small = cv2.resize(frame, (0, 0), fx=scale, fy=scale) if scale < 1.0 else frame
+    faces = detect_with_scores(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+    if not faces:
+        return 0.0, {"faces": 0}
+
+    (top, right, bottom, left), confidence = max(faces, key=lambda face: (face[0][2] - face[0][0]) * (face[0][1] - face[0][3]))
+    top, bottom = max(top, 0), min(bottom, small.shape[0])
+    left, right = max(left, 0), min(right, small.shape[1])
+    crop = cv2.cvtColor(small[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+    if crop.size == 0:
+        return 0.0, {"faces": len(faces)}
+
+    size = (bottom - top) / small.shape[0]  # Face height as a fraction of the frame
+    face_sharpness = sharpness(crop)
+    # Size saturates at half the frame height; sharpness counts on a log scale
+    score = min(size, 0.5) * math.log1p(face_sharpness) * (1.0 + max(confidence, 0.0))
+    return score, {"faces": len(faces), "face_height": round(size, 3),
+                   "sharpness": round(float(face_sharpness), 1), "confidence": round(float(confidence), 3)}
+
+
+def pick_best_frame(frames, candidates=SHARPEST_CANDIDATES):
+    """Return (frame, details) for the best enrollment frame, or (None, None) when no frame shows a face.
+
+    Whole-frame sharpness is cheap, so only the sharpest few frames go through face detection.
+    """
+    if not frames:
+        return None, None
+    ranked = sorted(frames, key=lambda frame: sharpness(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)), reverse=True)
+    best, best_score, best_details = None, 0.0, None
+    for frame in ranked[:candidates]:
+        score, details = score_frame(frame)
+        if score > best_score:
+            best, best_score, best_details = frame, score, details
+    if best is None:
+        return None, None
+    return best, dict(best_details, score=round(best_score, 3), frames_considered=len(frames))
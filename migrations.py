@@ -0,0 +1,270 @@
+"""Versioned schema migrations for patient_database.db.
+
+The schema version lives in PRAGMA user_version. migrate() applies every
+migration above it in order, each in its own transaction, so any existing
+database - created by app.py, by database_setup.py, or by an older release -
+ends up on the same schema.
+
+    python migrations.py            # migrate patient_database.db
+    python migrations.py --check    # also verify the hot queries use indexes
+"""
+import argparse
+import sqlite3
+import sys
+
+DB_FILE = "patient_database.db"
+
+
+def add_missing_columns(conn, table, columns):
+    """ALTER TABLE ADD COLUMN for each (name, type) the table doesn't have yet."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def migration_1_baseline(conn):
+    """One schema for the tables init_db(), ensure_reminders_table() and database_setup.py used to create."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_time DATETIME NOT NULL,
+            category TEXT DEFAULT 'general',
+            is_completed INTEGER DEFAULT 0,
+            is_recurring INTEGER DEFAULT 0,
+            recurrence_pattern TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_notification DATETIME
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patient_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            medical_history TEXT,
+            last_doctor_visit DATE,
+            next_medication_time TIME,
+            family_members TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS known_people (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            relation TEXT,
+            last_visit DATETIME
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS visit_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_name TEXT NOT NULL,
+            relation TEXT,
+            visit_date DATETIME NOT NULL,
+            duration_seconds INTEGER
+        )
+    ''')
+
+    # Tables created by older code lack some of these columns
+    add_missing_columns(conn, "reminders", [
+        ("category", "TEXT DEFAULT 'general'"),
+        ("is_completed", "INTEGER DEFAULT 0"),
+        ("is_recurring", "INTEGER DEFAULT 0"),
+        ("recurrence_pattern", "TEXT"),
+        ("created_at", "DATETIME"),
+        ("last_notification", "DATETIME"),
+    ])
+    add_missing_columns(conn, "visit_history", [("relation", "TEXT"), ("duration_seconds", "INTEGER")])
+
+
+def migration_2_indexes(conn):
+    """Indexes for the reminder window, name lookups and per-person visit history."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (due_time, is_completed)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_known_people_name ON known_people (name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_known_people_name_lower ON known_people (LOWER(name))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visit_history_person_date ON visit_history (person_name, visit_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visit_history_date ON visit_history (visit_date)")
+
+
+def migration_3_normalize_due_times(conn):
+    """Store every reminders.due_time as 'YYYY-MM-DD HH:MM:SS' so day ranges compare correctly as text."""
+    # Older rows may hold the browser's datetime-local form ('2024-01-01T08:00') or lack seconds
+    conn.execute("UPDATE reminders SET due_time = REPLACE(due_time, 'T', ' ') WHERE due_time LIKE '____-__-__T%'")
+    conn.execute("UPDATE reminders SET due_time = due_time || ':00' WHERE length(due_time) = 16")
+
+
+def migration_4_visit_rollups(conn):
+    """Visit rollups per person per day and week, keyed by normalized name and backfilled from visit_history."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS visit_daily (
+            person_key TEXT NOT NULL,
+            day DATE NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            dwell_seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (person_key, day)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS visit_weekly (
+            person_key TEXT NOT NULL,
+            week DATE NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            dwell_seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (person_key, week)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS visit_people (
+            person_key TEXT PRIMARY KEY,
+            person_name TEXT NOT NULL,
+            first_visit DATETIME NOT NULL,
+            last_visit DATETIME NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            dwell_seconds INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visit_daily_day ON visit_daily (day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_visit_people_last_visit ON visit_people (last_visit)")
+
+    # Backfill; the key is people.normalize_name as of this migration (case-folded, whitespace collapsed)
+    daily, weekly, totals = {}, {}, {}
+    for name, day, week, first, last, visits, dwell in conn.execute('''
+        SELECT person_name, date(visit_date), date(visit_date, 'weekday 0', '-6 days'),
+               MIN(visit_date), MAX(visit_date), COUNT(*), SUM(COALESCE(duration_seconds, 0))
+        FROM visit_history GROUP BY person_name, date(visit_date)
+    ''').fetchall():
+        display = " ".join(str(name or "").split())
+        key = display.casefold()
+        if not key or not day:
+            continue
+        for table, period in ((daily, day), (weekly, week)):
+            counts = table.setdefault((key, period), [0, 0])
+            counts[0] += visits
+            counts[1] += dwell
+        person = totals.setdefault(key, [display, first, last, 0, 0])
+        if last >= person[2]:
+            person[0] = display
+        person[1], person[2] = min(person[1], first), max(person[2], last)
+        person[3] += visits
+        person[4] += dwell
+    conn.executemany("INSERT INTO visit_daily (person_key, day, visits, dwell_seconds) VALUES (?, ?, ?, ?)",
+                     [key + tuple(counts) for key, counts in daily.items()])
+    conn.executemany("INSERT INTO visit_weekly (person_key, week, visits, dwell_seconds) VALUES (?, ?, ?, ?)",
+                     [key + tuple(counts) for key, counts in weekly.items()])
+    conn.executemany('''
+        INSERT INTO visit_people (person_key, person_name, first_visit, last_visit, visits, dwell_seconds)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(key,) + tuple(person) for key, person in totals.items()])
+
+
+def migration_5_recurrence_anchor(conn):
+    """reminders.recurrence_anchor: the day of the month a monthly reminder recurs on (NULL = its due_time's day)."""
+    add_missing_columns(conn, "reminders", [("recurrence_anchor", "INTEGER")])
+
+
+# (version, migration); never edit or reorder an applied migration - append a new one
+MIGRATIONS = [
+    (1, migration_1_baseline),
+    (2, migration_2_indexes),
+    (3, migration_3_normalize_due_times),
+    (4, migration_4_visit_rollups),
+    (5, migration_5_recurrence_anchor),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION; returns the versions applied."""
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # Also serializes two processes starting at once
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {version}: {migration.__doc__.strip()}")
+        applied.append(version)
+    return applied
+
+
+# Lookups that run on every request or scheduler tick; must never need a full table scan
+HOT_QUERIES = [
+    ("upcoming reminders",
+     "SELECT id, title, description, due_time, category FROM reminders "
+     "WHERE due_time BETWEEN ? AND ? AND (last_notification IS NULL OR last_notification < ?) AND is_completed = 0",
+     ("2024-01-01 00:00:00", "2024-01-01 00:30:00", "2023-12-31 23:45:00")),
+    ("reminders of a day",
+     "SELECT title, description, due_time, category FROM reminders "
+     "WHERE due_time >= ? AND due_time < ? AND is_completed = 0 ORDER BY due_time",
+     ("2024-01-01 00:00:00", "2024-01-02 00:00:00")),
+    ("reminder by title and time",
+     "SELECT title, description, due_time, category FROM reminders WHERE title = ? AND due_time = ?",
+     ("Medication", "2024-01-01 08:00:00")),
+    ("known person by name",
+     "SELECT relation, last_visit FROM known_people WHERE name=?", ("Alice",)),
+    ("known person by name, any case",
+     "SELECT name, relation, last_visit FROM known_people WHERE LOWER(name)=?", ("alice",)),
+    ("visits of a person",
+     "SELECT visit_date, duration_seconds FROM visit_history WHERE person_name = ? AND visit_date >= ? "
+     "ORDER BY visit_date", ("Alice", "2024-01-01 00:00:00")),
+    ("visits of a person per day",
+     "SELECT day, visits, dwell_seconds FROM visit_daily WHERE person_key = ? AND day >= ? AND day <= ? ORDER BY day",
+     ("alice", "2024-01-01", "2024-01-31")),
+    ("visits of everyone in a range",
+     "SELECT p.person_name, SUM(d.visits), SUM(d.dwell_seconds) FROM visit_daily d "
+     "JOIN visit_people p ON p.person_key = d.person_key WHERE d.day >= ? AND d.day <= ? GROUP BY d.person_key",
+     ("2024-01-01", "2024-01-31")),
+    ("people not seen since",
+     "SELECT person_name, last_visit FROM visit_people WHERE last_visit < ? ORDER BY last_visit",
+     ("2024-01-01 00:00:00",)),
+]
+
+
+def full_scans(conn, sql, params=()):
+    """The EXPLAIN QUERY PLAN steps of sql that scan a whole table without an index."""
+    plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in plan if row[3].startswith("SCAN ") and " USING " not in row[3]]
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Return {query name: [full scans]} for every hot query that scans a table."""
+    problems = {}
+    for name, sql, params in queries:
+        scans = full_scans(conn, sql, params)
+        if scans:
+            problems[name] = scans
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the patient database to the current schema")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--check", action="store_true", help="fail if a hot query needs a full table scan")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.db)
+    migrate(connection)
+    print(f"{args.db} is at schema version {schema_version(connection)}")
+    if args.check:
+        problems = check_query_plans(connection)
+        for query_name, scans in problems.items():
+            print(f"Full table scan in '{query_name}': {'; '.join(scans)}")
+        if problems:
+            sys.exit(1)
+        print(f"All {len(HOT_QUERIES)} hot queries use indexes")
+    connection.close()
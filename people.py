@@ -0,0 +1,145 @@
+import csv
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+PERSON_COLUMNS = ["Name", "Relation", "Age", "Medical_History", "Last_Visit", "Notes"]
+
+
+def normalize_name(name):
+    """Lookup key for a person's name: case-folded, with runs of whitespace collapsed."""
+    return " ".join(str(name or "").split()).casefold()
+
+
+def write_csv_atomic(file_path, rows, columns=PERSON_COLUMNS):
+    """Write rows (dicts) to a temp file in the same folder and rename it over the target."""
+    folder = os.path.dirname(file_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class PeopleRegistry:
+    """Everything known about each person, in one dict keyed by normalized name.
+
+    Loaded once from people_data.csv (details entered at enrollment), the
+    known_people table (relation and last visit) and the gallery names, so
+    lookups never scan a DataFrame or the database. Each entry is a dict with
+    "name", "details" (the CSV row, or None), "relation" and "last_visit" (from
+    known_people, or None). upsert() writes through to the CSV and the table;
+    touch() only updates memory, for visits the VisitSessionizer persists itself.
+    """
+
+    def __init__(self, db, csv_path):
+        self.db = db  # db.Database
+        self.csv_path = csv_path
+        self.people = {}
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+
+    def load(self, names=()):
+        """(Re)build the registry; names are extra people (e.g. the gallery's) with no details yet."""
+        people = {}
+
+        def entry(name):
+            key = normalize_name(name)
+            if key not in people:
+                people[key] = {"name": " ".join(str(name).split()), "details": None, "relation": None, "last_visit": None}
+            return people[key]
+
+        if os.path.exists(self.csv_path):
+            with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    if not normalize_name(row.get("Name")):
+                        continue
+                    details = {column: (row.get(column) or "").strip() for column in PERSON_COLUMNS}
+                    entry(details["Name"])["details"] = details  # Later rows win, as they did in the DataFrame
+
+        conn = self.db.connect()
+        try:
+            rows = conn.execute("SELECT name, relation, last_visit FROM known_people ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        for name, relation, last_visit in rows:
+            if normalize_name(name):
+                person = entry(name)
+                person["relation"], person["last_visit"] = relation, last_visit
+
+        for name in names:
+            if normalize_name(name):
+                entry(name)
+
+        with self.lock:
+            self.people = people
+        print(f"People registry loaded {len(people)} people")
+        return self
+
+    def get(self, name):
+        """A copy of the person's entry, or None."""
+        with self.lock:
+            self.lookups += 1
+            person = self.people.get(normalize_name(name))
+            if person is None:
+                self.misses += 1
+                return None
+            return dict(person, details=dict(person["details"]) if person["details"] else None)
+
+    def names(self):
+        """Display names of everyone in the registry."""
+        with self.lock:
+            return [person["name"] for person in self.people.values()]
+
+    def __contains__(self, name):
+        with self.lock:
+            return normalize_name(name) in self.people
+
+    def upsert(self, name, details, relation=None, last_visit=None):
+        """Add or replace a person's details; rewrites people_data.csv and their known_people row."""
+        name = " ".join(name.split())
+        key = normalize_name(name)
+        last_visit = last_visit or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        person = {"name": name, "details": dict({column: "" for column in PERSON_COLUMNS}, **details, Name=name),
+                  "relation": relation or "Unknown", "last_visit": last_visit}
+        with self.lock:
+            self.people.pop(key, None)  # Re-inserted last, so the CSV keeps the newest person at the end
+            self.people[key] = person
+            rows = [entry["details"] for entry in self.people.values() if entry["details"]]
+            try:
+                write_csv_atomic(self.csv_path, rows)
+            except Exception as e:
+                print(f"Warning - CSV update failed: {e}")
+
+        conn = self.db.connect()
+        try:
+            conn.execute("DELETE FROM known_people WHERE LOWER(name)=?", (name.lower(),))
+            conn.execute("INSERT INTO known_people (name, relation, last_visit) VALUES (?, ?, ?)",
+                         (name, person["relation"], last_visit))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def touch(self, name, when):
+        """Note a visit in memory (known_people is written by the VisitSessionizer)."""
+        key = normalize_name(name)
+        if not key:
+            return
+        with self.lock:
+            person = self.people.get(key)
+            if person is None:
+                person = self.people[key] = {"name": name, "details": None, "relation": "Unknown", "last_visit": None}
+            person["last_visit"] = when.strftime("%Y-%m-%d %H:%M:%S")
+
+    def stats(self):
+        with self.lock:
+            return {"people": len(self.people), "with_details": sum(1 for p in self.people.values() if p["details"]),
+                    "lookups": self.lookups, "misses": self.misses}
@@ -0,0 +1,223 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from face_tracking import overlaps
+
+
+def _worker_main(slot_names, tasks, results):
+    """Worker process (or thread): detect and encode faces in frames handed over through shared memory."""
+    import face_recognition  # Only the workers need dlib
+
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            sequence, slot, shape, upsample, reuse_boxes = task
+            started = time.perf_counter()
+
+            # View into the shared slot - no frame pickling; cvtColor makes the private copy we need
+            view = np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf)
+            rgb_small_frame = cv2.cvtColor(view, cv2.COLOR_BGR2RGB)
+            del view
+
+            try:
+                locations = face_recognition.face_locations(rgb_small_frame, number_of_times_to_upsample=upsample)
+                # Faces sitting on a confidently recognized track keep its identity - only encode the rest
+                new = [i for i, location in enumerate(locations) if not overlaps(location, reuse_boxes)]
+                encodings = [None] * len(locations)
+                for i, encoding in zip(new, face_recognition.face_encodings(rgb_small_frame, [locations[i] for i in new])):
+                    encodings[i] = np.asarray(encoding, dtype=np.float32)
+                detection = (locations, encodings)
+            except Exception as e:
+                print(f"Recognition worker error: {e}")
+                detection = ([], [])
+            results.put((sequence, slot, detection, time.perf_counter() - started))
+    finally:
+        for shm in slots:
+            shm.close()
+
+
+class RecognitionEngine:
+    """Capture thread + pool of detection/encoding worker processes + in-order collector.
+
+    The capture thread calls prepare_frame(frame), which returns the
+    downscaled frame, the detection upsampling (None when the frame should
+    only be tracked) and the boxes whose faces need no encoding. Frames to detect are copied into a free
+    shared-memory slot and queued for a worker. At most max_in_flight frames -
+    detected or only tracked - are between capture and finish_frame at once,
+    so the capture thread waits instead of queueing frames faster than they
+    are finished. All frames - detected or not - come back
+    through finish_frame(frame, small_frame, detection) strictly in capture
+    order, where detection is (locations, encodings) or None; encodings holds
+    None for the faces that were not encoded. Worker timings
+    are reported through record_detection(frame, small_frame, upsample, seconds, locations).
+    Where processes can't be forked (e.g. on Windows) the workers are threads,
+    since a spawned child would re-import __main__ and start the whole app again.
+    """
+
+    def __init__(self, capture, prepare_frame, finish_frame, workers=2, max_in_flight=None,
+                 record_detection=None, retry_delay=0.5):
+        self.capture = capture
+        self.prepare_frame = prepare_frame
+        self.finish_frame = finish_frame
+        self.record_detection = record_detection
+        self.worker_count = max(1, workers)
+        self.max_in_flight = max_in_flight or self.worker_count * 2
+        self.retry_delay = retry_delay
+
+        self.context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+        self.tasks = None
+        self.results = None
+        self.processes = []
+        self.slots = []
+        self.free_slots = queue.Queue()
+        self.window = threading.Semaphore(self.max_in_flight)  # Captured but not yet finished frames
+        self.ready = queue.Queue()   # (sequence, frame, small_frame, detection) in arrival order
+        self.pending = {}            # sequence -> (frame, small_frame, upsample) awaiting worker results
+        self.pending_lock = threading.Lock()
+        self.running = False
+
+        self.stats_lock = threading.Lock()
+        self.counters = {"captured": 0, "detected": 0, "tracked": 0, "emitted": 0}
+        self.worker_seconds = 0.0
+        self.started_at = None
+
+    def _start_workers(self, slot_bytes):
+        for slot in range(self.max_in_flight):
+            self.slots.append(shared_memory.SharedMemory(create=True, size=slot_bytes))
+            self.free_slots.put(slot)
+
+        slot_names = [shm.name for shm in self.slots]
+        if self.context is not None:
+            self.tasks = self.context.Queue()
+            self.results = self.context.Queue()
+        else:
+            self.tasks = queue.Queue()
+            self.results = queue.Queue()
+        for _ in range(self.worker_count):
+            if self.context is not None:
+                process = self.context.Process(
+                    target=_worker_main, args=(slot_names, self.tasks, self.results), daemon=True
+                )
+            else:
+                process = threading.Thread(target=_worker_main, args=(slot_names, self.tasks, self.results),
+                                           name="recognition-worker", daemon=True)
+            process.start()
+            self.processes.append(process)
+        threading.Thread(target=self._relay_results, name="recognition-results", daemon=True).start()
+
+    def _relay_results(self):
+        while self.running:
+            try:
+                sequence, slot, detection, seconds = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.free_slots.put(slot)
+            with self.pending_lock:
+                frame, small_frame, upsample = self.pending.pop(sequence)
+            with self.stats_lock:
+                self.worker_seconds += seconds
+            if self.record_detection is not None:
+                self.record_detection(frame, small_frame, upsample, seconds, detection[0])
+            self.ready.put((sequence, frame, small_frame, detection))
+
+    def _capture_loop(self):
+        sequence = 0
+        while self.running:
+            # Blocks while max_in_flight frames are waiting for workers or finish_frame
+            if not self.window.acquire(timeout=0.5):
+                continue
+            success, frame = self.capture.read()
+            if not success:
+                self.window.release()
+                time.sleep(self.retry_delay)
+                continue
+
+            if not self.slots:
+                # Slots fit a full-size frame so any chosen downscale factor fits
+                self._start_workers(frame.nbytes)
+            small_frame, upsample, reuse_boxes = self.prepare_frame(frame)
+
+            sequence += 1
+            with self.stats_lock:
+                self.counters["captured"] += 1
+
+            if upsample is None or small_frame.nbytes > self.slots[0].size:
+                with self.stats_lock:
+                    self.counters["tracked"] += 1
+                self.ready.put((sequence, frame, small_frame, None))
+                continue
+
+            # Free once the window is: every slot in use is held by an unfinished frame
+            slot = self.free_slots.get()
+            target = np.ndarray(small_frame.shape, dtype=np.uint8, buffer=self.slots[slot].buf)
+            target[:] = small_frame
+            del target
+            with self.pending_lock:
+                self.pending[sequence] = (frame, small_frame, upsample)
+            with self.stats_lock:
+                self.counters["detected"] += 1
+            self.tasks.put((sequence, slot, small_frame.shape, upsample, reuse_boxes))
+
+    def frames(self):
+        """Yield finished (annotated) frames in capture order."""
+        self.running = True
+        self.started_at = time.time()
+        threading.Thread(target=self._capture_loop, name="recognition-capture", daemon=True).start()
+
+        next_sequence = 1
+        reorder = {}
+        while self.running:
+            try:
+                sequence, frame, small_frame, detection = self.ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            reorder[sequence] = (frame, small_frame, detection)
+            while next_sequence in reorder:
+                frame, small_frame, detection = reorder.pop(next_sequence)
+                next_sequence += 1
+                self.window.release()
+                with self.stats_lock:
+                    self.counters["emitted"] += 1
+                try:
+                    frame = self.finish_frame(frame, small_frame, detection)
+                except Exception as e:
+                    print(f"Error processing frame: {e}")
+                yield frame
+
+    def stats(self):
+        """Per-stage counters and throughput since start."""
+        with self.stats_lock:
+            counters = dict(self.counters)
+            worker_seconds = self.worker_seconds
+        elapsed = max(time.time() - self.started_at, 1e-6) if self.started_at else None
+        with self.pending_lock:
+            in_flight = len(self.pending)
+        report = {
+            "workers": self.worker_count,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": in_flight,
+            "counters": counters,
+            "avg_worker_ms": round(1000 * worker_seconds / counters["detected"], 2) if counters["detected"] else None,
+        }
+        if elapsed:
+            report["fps"] = {stage: round(count / elapsed, 2) for stage, count in counters.items()}
+        return report
+
+    def stop(self):
+        self.running = False
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=2)
+        for shm in self.slots:
+            shm.close()
+            shm.unlink()
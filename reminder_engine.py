@@ -0,0 +1,357 @@
+import calendar
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+INTERVALS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1),
+             "week": timedelta(weeks=1)}
+NAMED_PATTERNS = {"hourly": "every 1 hour", "daily": "every 1 day", "weekly": "every 1 week",
+                  "monthly": "every 1 month", "yearly": "every 12 months"}
+
+
+def add_months(when, months, day=None):
+    """when moved by months, on day (default when.day) or the month's last day if it is shorter."""
+    month = when.month - 1 + months
+    year, month = when.year + month // 12, month % 12 + 1
+    return when.replace(year=year, month=month, day=min(day or when.day, calendar.monthrange(year, month)[1]))
+
+
+def parse_pattern(pattern):
+    """("interval", timedelta), ("months", n), ("weekdays", None), or None for no or an unknown pattern.
+
+    Patterns: hourly, daily, weekly, monthly, yearly, weekdays, or "every N
+    minutes|hours|days|weeks|months" (singular works too).
+    """
+    pattern = (pattern or "").strip().lower()
+    pattern = NAMED_PATTERNS.get(pattern, pattern)
+    if pattern == "weekdays":
+        return "weekdays", None
+    match = re.fullmatch(r"every\s+(\d+)\s+(minute|hour|day|week|month)s?", pattern)
+    if not match or int(match.group(1)) <= 0:
+        return None
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "month":
+        return "months", count
+    return "interval", count * INTERVALS[unit]
+
+
+def next_occurrence(due, pattern, anchor_day=None):
+    """The occurrence after due for a recurrence pattern, or None if it doesn't recur.
+
+    Monthly patterns land on anchor_day (the day of the month the reminder was
+    set for; default due.day), so a Jan 31 reminder clamped to Feb 29 is back
+    on Mar 31.
+    """
+    rule = parse_pattern(pattern)
+    if rule is None:
+        return None
+    kind, value = rule
+    if kind == "interval":
+        return due + value
+    if kind == "months":
+        return add_months(due, value, anchor_day)
+    due += timedelta(days=1)
+    while due.weekday() >= 5:
+        due += timedelta(days=1)
+    return due
+
+
+def first_occurrence_after(due, pattern, after, anchor_day=None):
+    """The first occurrence after due that is also later than after (None if it doesn't recur)."""
+    rule = parse_pattern(pattern)
+    if rule is None:
+        return None
+    if rule[0] == "interval" and due < after:
+        # Jump straight past after instead of stepping through every missed occurrence
+        step = rule[1]
+        return due + ((after - due) // step + 1) * step
+    occurrence = next_occurrence(due, pattern, anchor_day)
+    while occurrence <= after:
+        occurrence = next_occurrence(occurrence, pattern, anchor_day)
+    return occurrence
+
+
+def next_due_after_completion(due_time, pattern, now=None, anchor_day=None):
+    """Where a reminder due at due_time goes once completed: its next future occurrence, or None."""
+    due = parse_time(due_time)
+    if due is None or not pattern:
+        return None
+    return first_occurrence_after(due, pattern, now or datetime.now(), anchor_day or due.day)
+
+
+def parse_time(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(value, TIME_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+class ReminderEngine:
+    """Fire every pending reminder at its due time from a min-heap, instead of polling a time window.
+
+    The heap holds one entry per reminder: its next occurrence. Recurring
+    reminders are expanded lazily, pushing the following occurrence when one
+    fires. add(), update() and complete() change the heap in place; replaced
+    entries are skipped when they surface (version check), so there is no
+    re-query. The thread sleeps until the earliest entry is due or the heap
+    changes, so an idle engine never wakes up, however many reminders it holds.
+
+    on_due(reminder) gets a dict with id, title, description, due_time,
+    category and recurrence_pattern. The database row's due_time always names
+    the occurrence awaiting completion; a recurring row moves on when its next
+    occurrence fires or it is completed, and its recurrence_anchor keeps the
+    day of the month it was set for (see next_occurrence()).
+    """
+
+    def __init__(self, db, on_due, lead=timedelta(0), missed_grace=timedelta(hours=1), day_cache=None):
+        self.db = db
+        self.on_due = on_due
+        self.day_cache = day_cache        # ReminderDayCache to invalidate when a recurring row moves on
+        self.lead = lead                  # Fire this long before the due time
+        self.missed_grace = missed_grace  # On start, still fire reminders that came due this recently
+        self.heap = []                    # (fire timestamp, reminder id, version, occurrence datetime)
+        self.reminders = {}               # id -> reminder dict (current row values)
+        self.versions = {}                # id -> version of its live heap entry
+        self.condition = threading.Condition()
+        self.fired = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Load every pending reminder and start firing them."""
+        conn = self.db.connect()
+        try:
+            rows = conn.execute('''
+                SELECT id, title, description, due_time, category, is_recurring, recurrence_pattern, last_notification,
+                       recurrence_anchor
+                FROM reminders WHERE is_completed = 0
+            ''').fetchall()
+        finally:
+            conn.close()
+        now = datetime.now()
+        with self.condition:
+            for row in rows:
+                reminder = self._as_reminder(row)
+                if reminder is not None:
+                    self._schedule(reminder, parse_time(row[7]), now)
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="reminder-engine", daemon=True)
+        self.thread.start()
+        print(f"Reminder engine loaded {len(self.versions)} pending reminders")
+
+    @staticmethod
+    def _as_reminder(row):
+        due = parse_time(row[3])
+        if due is None:
+            print(f"Skipping reminder {row[0]} with unreadable due time {row[3]!r}")
+            return None
+        pattern = row[6] if row[5] else None
+        return {"id": row[0], "title": row[1], "description": row[2] or "", "due_time": due,
+                "category": row[4], "recurrence_pattern": pattern, "anchor_day": row[8] or due.day}
+
+    def _push(self, reminder_id, occurrence):
+        version = self.versions.get(reminder_id, 0) + 1
+        self.versions[reminder_id] = version
+        heapq.heappush(self.heap, ((occurrence - self.lead).timestamp(), reminder_id, version, occurrence))
+        self.condition.notify()
+
+    def _schedule(self, reminder, last_notification=None, now=None):
+        """Push the reminder's next occurrence that still needs firing (caller holds the condition)."""
+        now = now or datetime.now()
+        self.reminders[reminder["id"]] = reminder
+        occurrence = reminder["due_time"]
+        overdue = occurrence - self.lead < now - self.missed_grace
+        notified = last_notification is not None and last_notification >= occurrence - self.lead
+        if overdue or notified:
+            # Long overdue or already announced: only a recurring reminder has anything left to fire
+            occurrence = first_occurrence_after(occurrence, reminder["recurrence_pattern"], now + self.lead,
+                                                reminder["anchor_day"])
+        if occurrence is None:
+            self.reminders.pop(reminder["id"], None)
+            self.versions.pop(reminder["id"], None)
+            return
+        self._push(reminder["id"], occurrence)
+
+    def add(self, reminder):
+        """Schedule a reminder dict (as passed to on_due, plus an optional anchor_day; due_time may be a string)."""
+        reminder = dict(reminder, due_time=parse_time(reminder["due_time"]))
+        if reminder["due_time"] is None:
+            return
+        reminder["anchor_day"] = reminder.get("anchor_day") or reminder["due_time"].day
+        with self.condition:
+            self._schedule(reminder)
+
+    def update(self, reminder):
+        """Re-schedule an edited reminder; the old heap entry is dropped when it surfaces."""
+        self.add(reminder)
+
+    def complete(self, reminder_id, following):
+        """Apply a committed completion: stop firing, or for a recurring reminder wait for following.
+
+        following is what next_due_after_completion() gave for the row (None if it doesn't recur).
+        """
+        with self.condition:
+            reminder = self.reminders.get(reminder_id)
+            if reminder is None or following is None:
+                self.reminders.pop(reminder_id, None)
+                self.versions.pop(reminder_id, None)
+                self.condition.notify()
+                return
+            reminder["due_time"] = following
+            self._push(reminder_id, following)
+
+    def _pop_due(self):
+        """Wait for the next live entry to come due and pop it (None when stopping)."""
+        with self.condition:
+            while self.running:
+                while self.heap and self.versions.get(self.heap[0][1]) != self.heap[0][2]:
+                    heapq.heappop(self.heap)  # Completed or re-scheduled since it was pushed
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                wait = self.heap[0][0] - time.time()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                _, reminder_id, _, occurrence = heapq.heappop(self.heap)
+                reminder = self.reminders[reminder_id]
+                superseded = reminder["due_time"] if occurrence > reminder["due_time"] else None
+                if superseded is not None:
+                    reminder["due_time"] = occurrence
+                # Lazy expansion: just the next one still ahead, so a late start fires a missed run once
+                following = first_occurrence_after(occurrence, reminder["recurrence_pattern"],
+                                                   datetime.now() + self.lead, reminder["anchor_day"])
+                if following is not None:
+                    self._push(reminder_id, following)
+                else:
+                    self.versions.pop(reminder_id, None)
+                    self.reminders.pop(reminder_id, None)
+                return dict(reminder, due_time=occurrence), superseded
+            return None
+
+    def _run(self):
+        while True:
+            due = self._pop_due()
+            if due is None:
+                break
+            reminder, superseded = due
+            now = datetime.now().strftime(TIME_FORMAT)
+            conn = self.db.connect()
+            try:
+                if superseded is not None:
+                    # The previous occurrence was never completed; the row now tracks this one
+                    conn.execute("UPDATE reminders SET due_time = ?, recurrence_anchor = ?, last_notification = ? "
+                                 "WHERE id = ?",
+                                 (reminder["due_time"].strftime(TIME_FORMAT), reminder["anchor_day"], now, reminder["id"]))
+                else:
+                    conn.execute("UPDATE reminders SET last_notification = ? WHERE id = ?", (now, reminder["id"]))
+                conn.commit()
+                if superseded is not None and self.day_cache is not None:
+                    self.day_cache.invalidate(superseded, reminder["due_time"])
+            except Exception as e:
+                print(f"Error recording reminder notification: {e}")
+            finally:
+                conn.close()
+
+            self.fired += 1
+            try:
+                payload = dict(reminder, due_time=reminder["due_time"].strftime(TIME_FORMAT))
+                del payload["anchor_day"]
+                self.on_due(payload)
+            except Exception as e:
+                print(f"Error delivering reminder {reminder['id']}: {e}")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            next_due = None
+            live = [entry for entry in self.heap if self.versions.get(entry[1]) == entry[2]]
+            if live:
+                next_due = min(live)[3].strftime(TIME_FORMAT)
+            return {"pending": len(self.versions), "heap": len(self.heap), "fired": self.fired, "next_due": next_due}
+
+
+class ReminderDayCache:
+    """Per-day cache of the open reminders list, so repeated reads never touch the database.
+
+    Days are loaded with a half-open due_time range (which the due_time index
+    serves) and dropped by invalidate() whenever a write moves a reminder into
+    or out of them. A load that raced with an invalidation of its day is not
+    cached. Holds up to max_days days, least recently used first out.
+    """
+
+    def __init__(self, db, max_days=14):
+        self.db = db
+        self.max_days = max_days
+        self.days = OrderedDict()  # "YYYY-MM-DD" -> list of (title, description, due_time, category)
+        self.generations = {}      # day -> bumped on every invalidation
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def day_key(value):
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d")
+        return str(value)[:10]
+
+    def get(self, day):
+        """Open reminders due on day (date, datetime or "YYYY-MM-DD"), ordered by due time."""
+        key = self.day_key(day)
+        with self.lock:
+            if key in self.days:
+                self.days.move_to_end(key)
+                self.hits += 1
+                return list(self.days[key])
+            self.misses += 1
+            generation = self.generations.get(key, 0)
+
+        start = datetime.strptime(key, "%Y-%m-%d")
+        conn = self.db.connect()
+        try:
+            rows = conn.execute('''
+                SELECT title, description, due_time, category
+                FROM reminders
+                WHERE due_time >= ? AND due_time < ?
+                AND is_completed = 0
+                ORDER BY due_time
+            ''', (start.strftime(TIME_FORMAT), (start + timedelta(days=1)).strftime(TIME_FORMAT))).fetchall()
+        finally:
+            conn.close()
+
+        with self.lock:
+            if self.generations.get(key, 0) == generation:
+                self.days[key] = rows
+                while len(self.days) > self.max_days:
+                    self.days.popitem(last=False)
+        return list(rows)
+
+    def invalidate(self, *due_times):
+        """Forget the days of these due times (datetimes or timestamp strings); None entries are ignored."""
+        with self.lock:
+            for due_time in due_times:
+                if due_time is None:
+                    continue
+                key = self.day_key(due_time)
+                self.days.pop(key, None)
+                self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            for key in set(self.days) | set(self.generations):
+                self.generations[key] = self.generations.get(key, 0) + 1
+            self.days.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"days": len(self.days), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from face_memory import write_json_atomic
+
+
+def over_limits(entries, policy, now):
+    """Pick what to delete from entries [(timestamp, size, key)] sorted oldest first.
+
+    Everything older than max_age goes, then the oldest of the rest until at
+    most max_count entries and max_bytes remain. Limits that are None don't apply.
+    """
+    max_age, max_count, max_bytes = policy.get("max_age"), policy.get("max_count"), policy.get("max_bytes")
+    count, total = len(entries), sum(entry[1] for entry in entries)
+    doomed = []
+    for timestamp, size, key in entries:
+        expired = max_age is not None and timestamp < now - max_age
+        too_many = max_count is not None and count > max_count
+        too_big = max_bytes is not None and total > max_bytes
+        if not (expired or too_many or too_big):
+            break  # Oldest first: everything after this one is newer and within limits
+        doomed.append((timestamp, size, key))
+        count -= 1
+        total -= size
+    return doomed
+
+
+class FileStore:
+    """Files under a folder (e.g. temp_captures/), oldest deleted first by modification time.
+
+    Files younger than min_age are never deleted, so a capture still waiting
+    to be enrolled survives even when the folder is over its limits.
+    """
+
+    def __init__(self, path, suffixes=(".jpg", ".jpeg", ".png"), min_age=3600):
+        self.path = path
+        self.suffixes = tuple(suffixes)
+        self.min_age = min_age
+
+    def _scan(self, folder):
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from self._scan(entry.path)
+                    elif entry.name.lower().endswith(self.suffixes):
+                        stat = entry.stat(follow_symlinks=False)
+                        yield stat.st_mtime, stat.st_size, entry.path
+        except FileNotFoundError:
+            return
+
+    def compact(self, policy, budget, pause):
+        """Delete up to budget files over the policy; returns (files removed, bytes freed)."""
+        now = time.time()
+        doomed = [entry for entry in over_limits(sorted(self._scan(self.path)), policy, now)
+                  if entry[0] < now - self.min_age]
+        removed = freed = 0
+        for _, size, path in doomed[:budget]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Enrolled (moved) or deleted meanwhile
+            removed += 1
+            freed += size
+            time.sleep(pause)
+        return removed, freed
+
+
+class TableStore:
+    """Rows of a table with a timestamp column, deleted oldest first in small transactions.
+
+    Space comes back to the file system through RetentionService's vacuum
+    step, so bytes freed are reported there rather than here. Pruned
+    visit_history rows stay counted in the visit rollups (see visit_rollups.py).
+    """
+
+    def __init__(self, db, table, time_column, batch_size=200, time_format="%Y-%m-%d %H:%M:%S"):
+        self.db = db  # db.Database
+        self.table = table
+        self.time_column = time_column
+        self.batch_size = batch_size
+        self.time_format = time_format
+
+    def _delete_batch(self, conn, where, params, limit):
+        with conn:
+            return conn.execute(f'''
+                DELETE FROM {self.table} WHERE rowid IN (
+                    SELECT rowid FROM {self.table} {where} ORDER BY {self.time_column}, rowid LIMIT ?
+                )
+            ''', params + (limit,)).rowcount
+
+    def compact(self, policy, budget, pause):
+        """Delete up to budget rows over the policy (max_age, max_count); returns (rows removed, 0)."""
+        removed = 0
+        conn = self.db.connect()
+        try:
+            if policy.get("max_age") is not None:
+                cutoff = (datetime.now() - timedelta(seconds=policy["max_age"])).strftime(self.time_format)
+                while removed < budget:
+                    deleted = self._delete_batch(conn, f"WHERE {self.time_column} < ?", (cutoff,),
+                                                 min(self.batch_size, budget - removed))
+                    removed += deleted
+                    if deleted < self.batch_size:
+                        break
+                    time.sleep(pause * deleted)  # Let the camera and visit writers in between batches
+            if policy.get("max_count") is not None and removed < budget:
+                extra = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - policy["max_count"]
+                while extra > 0 and removed < budget:
+                    deleted = self._delete_batch(conn, "", (), min(self.batch_size, extra, budget - removed))
+                    if not deleted:
+                        break
+                    removed += deleted
+                    extra -= deleted
+                    time.sleep(pause * deleted)
+        finally:
+            conn.close()
+        return removed, 0
+
+
+class JsonListStore:
+    """A list inside a JSON file (e.g. the "memories" of chat_memory.json); oldest items are dropped first.
+
+    Items carry no reliable timestamp, so only max_count and max_bytes apply.
+    Pass the lock the file's other writers hold, so an item saved while the
+    list is being trimmed is not lost.
+    """
+
+    def __init__(self, path, key, lock=None):
+        self.path = path
+        self.key = key
+        self.lock = lock or threading.Lock()
+
+    def compact(self, policy, budget, pause):
+        """Trim the list to the policy (at most budget items); returns (items removed, bytes freed)."""
+        with self.lock:
+            return self._compact(policy, budget)
+
+    def _compact(self, policy, budget):
+        if not os.path.exists(self.path):
+            return 0, 0
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Retention skipped {self.path}: {e}")
+            return 0, 0
+        items = data.get(self.key) if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return 0, 0
+
+        # Sizes are each item's share of the file; "timestamps" are just list positions
+        entries = [(index, len(json.dumps(item)) + 10, index) for index, item in enumerate(items)]
+        doomed = over_limits(entries, {"max_count": policy.get("max_count"), "max_bytes": policy.get("max_bytes")}, 0)
+        drop = min(len(doomed), budget)
+        if not drop:
+            return 0, 0
+        size = os.path.getsize(self.path)
+        data[self.key] = items[drop:]
+        write_json_atomic(self.path, data)
+        return drop, max(size - os.path.getsize(self.path), 0)
+
+
+class RetentionService:
+    """Keep captures, unknown faces, visit history and chat memory within per-store limits.
+
+    stores maps a name to (store, policy); a policy is a dict with any of
+    max_age (seconds), max_count and max_bytes. run() removes at most
+    max_deletes items per call, pausing between deletions to stay under
+    deletes_per_second, so a backlog is worked off over several runs instead
+    of in one I/O burst. After rows are deleted it returns up to vacuum_pages
+    free pages to the file system with PRAGMA incremental_vacuum; vacuum()
+    does a full VACUUM when enough free space has piled up (and switches the
+    database to incremental auto-vacuum the first time). Both are meant to be
+    scheduled, e.g. run() every half hour and vacuum() nightly.
+    """
+
+    def __init__(self, db, stores, max_deletes=500, deletes_per_second=50, vacuum_pages=512,
+                 vacuum_free_bytes=64 * 2**20):
+        self.db = db  # db.Database
+        self.stores = stores
+        self.max_deletes = max_deletes
+        self.pause = 1.0 / deletes_per_second if deletes_per_second else 0.0
+        self.vacuum_pages = vacuum_pages
+        self.vacuum_free_bytes = vacuum_free_bytes
+        self.lock = threading.Lock()  # run() and vacuum() never overlap
+        self.totals = {name: {"removed": 0, "bytes": 0} for name in stores}
+        self.database_bytes = 0
+        self.runs = 0
+        self.last_run = None
+
+    def _pages(self, conn):
+        """(free bytes, page size, auto_vacuum mode) of the database."""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return free * page_size, page_size, conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+    def _incremental_vacuum(self):
+        conn = self.db.connect()
+        try:
+            free, _, mode = self._pages(conn)
+            if mode != 2 or not free:  # 2 = INCREMENTAL
+                return 0
+            # executescript: a plain execute() stops after the first page
+            conn.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+            return free - self._pages(conn)[0]
+        finally:
+            conn.close()
+
+    def run(self):
+        """One bounded retention pass over every store; returns {store: (removed, bytes freed)}."""
+        with self.lock:
+            budget = self.max_deletes
+            report = {}
+            for name, (store, policy) in self.stores.items():
+                if budget <= 0:
+                    break
+                try:
+                    removed, freed = store.compact(policy, budget, self.pause)
+                except Exception as e:
+                    print(f"Retention error in {name}: {e}")
+                    continue
+                budget -= removed
+                report[name] = (removed, freed)
+                self.totals[name]["removed"] += removed
+                self.totals[name]["bytes"] += freed
+
+            if any(removed for removed, _ in report.values()):
+                try:
+                    reclaimed = self._incremental_vacuum()
+                except Exception as e:
+                    print(f"Retention error in incremental vacuum: {e}")
+                    reclaimed = 0
+                self.database_bytes += reclaimed
+                report["database"] = (0, reclaimed)
+            self.runs += 1
+            self.last_run = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        cleaned = {name: result for name, result in report.items() if any(result)}
+        if cleaned:
+            print("Retention reclaimed " + ", ".join(
+                f"{name}: {removed} item(s), {freed / 2**20:.1f} MB" for name, (removed, freed) in cleaned.items()))
+        return report
+
+    def vacuum(self, force=False):
+        """Full VACUUM when free pages exceed vacuum_free_bytes (or force); returns bytes reclaimed."""
+        with self.lock:
+            conn = self.db.connect()
+            try:
+                free, page_size, mode = self._pages(conn)
+                if not force and mode == 2 and free < self.vacuum_free_bytes:
+                    return 0
+                size = conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+                if mode != 2:
+                    # Only takes effect through a VACUUM; afterwards run() can free pages incrementally
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+                reclaimed = max(size - conn.execute("PRAGMA page_count").fetchone()[0] * page_size, 0)
+            finally:
+                conn.close()
+            self.database_bytes += reclaimed
+        print(f"Vacuumed the database, reclaimed {reclaimed / 2**20:.1f} MB")
+        return reclaimed
+
+    def stats(self):
+        with self.lock:
+            return {"stores": {name: dict(totals) for name, totals in self.totals.items()},
+                    "database_bytes": self.database_bytes, "runs": self.runs, "last_run": self.last_run}
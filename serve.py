@@ -1,5 +1,5 @@
 from waitress import serve
-from app import app
+from app import app, SERVER_THREADS
 import socket
 
 def get_local_ip():
@@ -22,4 +22,5 @@ if __name__ == '__main__':
     print(f"Access your app on other devices using:")
     print(f"http://{host}:{port}")
     print("For mobile devices, make sure they are on the same WiFi network.")
-    serve(app, host=host, port=port) 
\ No newline at end of file
+    # The default of 4 threads is used up by two open pages (/events + /video_feed each)
+    serve(app, host=host, port=port, threads=SERVER_THREADS) 
\ No newline at end of file
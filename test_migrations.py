@@ -0,0 +1,34 @@
+import sqlite3
+
+from migrations import SCHEMA_VERSION, check_query_plans, full_scans, migrate, schema_version
+
+
+def migrated(tmp_path):
+    conn = sqlite3.connect(tmp_path / "patient_database.db")
+    migrate(conn)
+    return conn
+
+
+def test_migrate_reaches_schema_version(tmp_path):
+    conn = migrated(tmp_path)
+    try:
+        assert schema_version(conn) == SCHEMA_VERSION
+        assert migrate(conn) == []  # Already current: nothing to apply
+    finally:
+        conn.close()
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    conn = migrated(tmp_path)
+    try:
+        assert check_query_plans(conn) == {}
+    finally:
+        conn.close()
+
+
+def test_full_scans_reports_unindexed_lookup(tmp_path):
+    conn = migrated(tmp_path)
+    try:
+        assert full_scans(conn, "SELECT id FROM reminders WHERE title = ?", ("Medication",))
+    finally:
+        conn.close()
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+# Stream profiles clients can pick on /video_feed: width None keeps the camera resolution
+STREAM_PROFILES = {
+    "high": {"width": None, "quality": 95},
+    "medium": {"width": 640, "quality": 75},
+    "low": {"width": 320, "quality": 50},
+}
+DEFAULT_PROFILE = "high"
+
+
+def encode_jpeg(frame, profile=DEFAULT_PROFILE):
+    """Resize a frame to a stream profile and JPEG-encode it; returns bytes or None."""
+    settings = STREAM_PROFILES[profile]
+    width = settings["width"]
+    if width and frame.shape[1] > width:
+        height = int(frame.shape[0] * width / frame.shape[1])
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, settings["quality"]])
+    return buffer.tobytes() if ok else None
+
+
+class FrameBroadcaster:
+    """Run one capture-and-recognize loop and share its frames with every viewer.
+
+    Annotated frames go into a ring buffer un-encoded. Each frame is JPEG-encoded
+    at most once per stream profile, by whichever viewer asks first; every other
+    viewer on that profile reuses the same bytes.
+    """
+
+    def __init__(self, capture, process_frame, buffer_size=8, retry_delay=0.5, frame_source=None):
+        self.capture = capture
+        self.process_frame = process_frame
+        # Optional callable returning an iterator of processed frames (e.g. RecognitionEngine.frames)
+        self.frame_source = frame_source
+        self.retry_delay = retry_delay
+
+        # Ring buffer of (sequence, annotated frame); old frames fall off the end
+        self.frames = deque(maxlen=buffer_size)
+        self.sequence = 0
+        self.condition = threading.Condition()
+
+        # profile -> (sequence, jpeg_bytes) for the newest frame encoded on that profile
+        self.encoded = {}
+        self.encode_locks = {profile: threading.Lock() for profile in STREAM_PROFILES}
+        self.encode_counts = {profile: 0 for profile in STREAM_PROFILES}
+        self.viewers = {profile: 0 for profile in STREAM_PROFILES}
+
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the background capture thread if it is not already running."""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name="frame-broadcaster", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Ask the capture thread to exit and wake any waiting viewers."""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def _frames(self):
+        """Default frame source: read and process frames one at a time on this thread."""
+        while self.running:
+            success, frame = self.capture.read()
+            if not success:
+                # Camera hiccup - back off instead of spinning on a dead device
+                time.sleep(self.retry_delay)
+                continue
+
+            try:
+                frame = self.process_frame(frame)
+            except Exception as e:
+                print(f"Error processing frame: {e}")
+            yield frame
+
+    def _run(self):
+        source = self.frame_source() if self.frame_source is not None else self._frames()
+        for frame in source:
+            if not self.running:
+                break
+            self.publish(frame)
+
+    def publish(self, frame):
+        """Append an annotated frame to the ring buffer and wake all viewers."""
+        with self.condition:
+            self.sequence += 1
+            self.frames.append((self.sequence, frame))
+            self.condition.notify_all()
+
+    def encode(self, sequence, frame, profile=DEFAULT_PROFILE):
+        """Return JPEG bytes for a frame on a profile, encoding it only if no viewer did already."""
+        cached = self.encoded.get(profile)
+        if cached is not None and cached[0] == sequence:
+            return cached[1]
+
+        with self.encode_locks[profile]:
+            cached = self.encoded.get(profile)
+            if cached is not None and cached[0] >= sequence:
+                return cached[1]
+
+            frame_bytes = encode_jpeg(frame, profile)
+            if frame_bytes is None:
+                return None
+            self.encoded[profile] = (sequence, frame_bytes)
+            self.encode_counts[profile] += 1
+            return frame_bytes
+
+    def latest(self):
+        """Return (sequence, frame) for the newest annotated frame, or (0, None) if none yet."""
+        with self.condition:
+            if not self.frames:
+                return 0, None
+            return self.frames[-1]
+
+    def wait_for_frame(self, last_sequence, timeout=1.0):
+        """Block until a frame newer than last_sequence exists and return the newest one."""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: not self.running or (self.frames and self.frames[-1][0] > last_sequence),
+                timeout=timeout,
+            )
+            if not self.frames or self.frames[-1][0] <= last_sequence:
+                return last_sequence, None
+            return self.frames[-1]
+
+    def stream(self, profile=DEFAULT_PROFILE, max_fps=None):
+        """Yield MJPEG multipart chunks for one viewer.
+
+        Slow viewers always skip to the newest frame, and max_fps caps how often
+        this viewer is sent one, so nothing queues up behind a slow connection.
+        """
+        self.start()
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        last_sequence = 0
+        last_sent = 0.0
+        self.viewers[profile] += 1
+        try:
+            while self.running:
+                wait = last_sent + min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                sequence, frame = self.wait_for_frame(last_sequence)
+                if frame is None:
+                    continue
+                frame_bytes = self.encode(sequence, frame, profile)
+                last_sequence = sequence
+                if frame_bytes is None:
+                    continue
+                last_sent = time.monotonic()
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        finally:
+            self.viewers[profile] -= 1
+
+    def stats(self):
+        """Frames published, JPEG encodes and connected viewers per profile."""
+        return {
+            "frames_published": self.sequence,
+            "encodes": dict(self.encode_counts),
+            "viewers": dict(self.viewers),
+        }
@@ -0,0 +1,180 @@
+"""Per-person visit rollups, updated in the same transaction as each visit.
+
+visit_daily and visit_weekly hold visits and dwell seconds per person per
+day / week (weeks start on Monday); visit_people holds each person's totals,
+first and last visit, and the name they were last logged under. Rows are
+keyed by people.normalize_name, so "Jilu Elsa Jacob" and "jilu  elsa jacob"
+are one person. Every writer of visit_history calls record() with the visits
+it inserts, so summaries read a handful of rollup rows however long the
+history grows. Rows deleted from visit_history (e.g. by the retention
+service) stay counted, which is also why rebuild() refuses to run once the
+rollups hold more visits than visit_history: recomputing would drop them.
+
+    python visit_rollups.py --rebuild           # recompute from visit_history
+    python visit_rollups.py --rebuild --force   # ...even if that loses pruned visits
+"""
+import argparse
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from people import normalize_name
+
+DB_FILE = "patient_database.db"
+ROLLUP_TABLES = ("visit_daily", "visit_weekly", "visit_people")
+
+
+def week_start(day):
+    """The Monday of day's week."""
+    return day - timedelta(days=day.weekday())
+
+
+def _add(conn, rows):
+    """Upsert pre-aggregated rows (key, name, day, first, last, visits, dwell_seconds) into every rollup."""
+    weeks = {}
+    for row in rows:
+        weeks.setdefault(row[2], week_start(date.fromisoformat(row[2])).isoformat())
+    conn.executemany('''
+        INSERT INTO visit_daily (person_key, day, visits, dwell_seconds) VALUES (?, ?, ?, ?)
+        ON CONFLICT (person_key, day) DO UPDATE
+        SET visits = visits + excluded.visits, dwell_seconds = dwell_seconds + excluded.dwell_seconds
+    ''', [(key, day, visits, dwell) for key, _, day, _, _, visits, dwell in rows])
+    conn.executemany('''
+        INSERT INTO visit_weekly (person_key, week, visits, dwell_seconds) VALUES (?, ?, ?, ?)
+        ON CONFLICT (person_key, week) DO UPDATE
+        SET visits = visits + excluded.visits, dwell_seconds = dwell_seconds + excluded.dwell_seconds
+    ''', [(key, weeks[day], visits, dwell) for key, _, day, _, _, visits, dwell in rows])
+    conn.executemany('''
+        INSERT INTO visit_people (person_key, person_name, first_visit, last_visit, visits, dwell_seconds)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (person_key) DO UPDATE
+        SET person_name = CASE WHEN excluded.last_visit >= last_visit THEN excluded.person_name ELSE person_name END,
+            first_visit = MIN(first_visit, excluded.first_visit),
+            last_visit = MAX(last_visit, excluded.last_visit),
+            visits = visits + excluded.visits, dwell_seconds = dwell_seconds + excluded.dwell_seconds
+    ''', [(key, name, first, last, visits, dwell) for key, name, _, first, last, visits, dwell in rows])
+
+
+def record(conn, visits):
+    """Count visits [(person_name, visit_date 'YYYY-MM-DD HH:MM:SS', duration_seconds or None)].
+
+    Call it inside the transaction that inserts them into visit_history.
+    """
+    rows = [(normalize_name(name), " ".join(name.split()), visit_date[:10], visit_date, visit_date,
+             1, int(duration or 0))
+            for name, visit_date, duration in visits if normalize_name(name)]
+    if rows:
+        _add(conn, rows)
+
+
+def pruned_visits(conn):
+    """How many counted visits are no longer in visit_history (0 if none were pruned)."""
+    counted = conn.execute("SELECT COALESCE(SUM(visits), 0) FROM visit_people").fetchone()[0]
+    return max(counted - conn.execute("SELECT COUNT(*) FROM visit_history").fetchone()[0], 0)
+
+
+def rebuild(conn, force=False):
+    """Recompute every rollup from visit_history (caller commits); returns the number of people.
+
+    Raises ValueError if visits were pruned from visit_history since they
+    were counted, unless force is set, since rebuilding would lose them.
+    """
+    pruned = pruned_visits(conn)
+    if pruned and not force:
+        raise ValueError(f"{pruned} counted visits are no longer in visit_history; "
+                         f"rebuilding would drop them from the rollups (use force to do it anyway)")
+    for table in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+    groups = conn.execute('''
+        SELECT person_name, date(visit_date), MIN(visit_date), MAX(visit_date), COUNT(*),
+               SUM(COALESCE(duration_seconds, 0))
+        FROM visit_history GROUP BY person_name, date(visit_date)
+    ''').fetchall()
+    _add(conn, [(normalize_name(name), " ".join(name.split()), day, first, last, visits, dwell)
+                for name, day, first, last, visits, dwell in groups if normalize_name(name) and day])
+    return conn.execute("SELECT COUNT(*) FROM visit_people").fetchone()[0]
+
+
+def person_summary(conn, name, since, until, by="day"):
+    """One person's visits from since to until (dates, inclusive), per day or per week, with totals."""
+    key = normalize_name(name)
+    if by == "week":
+        rows = conn.execute('''
+            SELECT week, visits, dwell_seconds FROM visit_weekly
+            WHERE person_key = ? AND week >= ? AND week <= ? ORDER BY week
+        ''', (key, week_start(since).isoformat(), until.isoformat())).fetchall()
+    else:
+        rows = conn.execute('''
+            SELECT day, visits, dwell_seconds FROM visit_daily
+            WHERE person_key = ? AND day >= ? AND day <= ? ORDER BY day
+        ''', (key, since.isoformat(), until.isoformat())).fetchall()
+    totals = conn.execute('''
+        SELECT person_name, first_visit, last_visit, visits FROM visit_people WHERE person_key = ?
+    ''', (key,)).fetchone()
+    return {
+        "name": totals[0] if totals else name,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "visits": sum(row[1] for row in rows),
+        "dwell_seconds": sum(row[2] for row in rows),
+        by + "s": [{by: row[0], "visits": row[1], "dwell_seconds": row[2]} for row in rows],
+        "first_visit": totals[1] if totals else None,
+        "last_visit": totals[2] if totals else None,
+        "all_time_visits": totals[3] if totals else 0,
+    }
+
+
+def everyone_summary(conn, since, until):
+    """Visits and dwell seconds per person from since to until (dates, inclusive), most visits first."""
+    rows = conn.execute('''
+        SELECT p.person_name, SUM(d.visits), SUM(d.dwell_seconds)
+        FROM visit_daily d JOIN visit_people p ON p.person_key = d.person_key
+        WHERE d.day >= ? AND d.day <= ? GROUP BY d.person_key ORDER BY SUM(d.visits) DESC, p.person_name
+    ''', (since.isoformat(), until.isoformat())).fetchall()
+    return [{"name": row[0], "visits": row[1], "dwell_seconds": row[2]} for row in rows]
+
+
+def not_seen_since(conn, cutoff, names=()):
+    """People whose last visit is before cutoff (a datetime), longest absent first.
+
+    names (e.g. everyone enrolled) who never visited at all come first, with last_visit None.
+    """
+    rows = conn.execute('''
+        SELECT person_name, last_visit FROM visit_people WHERE last_visit < ? ORDER BY last_visit
+    ''', (cutoff.strftime("%Y-%m-%d %H:%M:%S"),)).fetchall()
+    visited = {row[0] for row in conn.execute("SELECT person_key FROM visit_people")}
+    never = {}
+    for name in names:
+        key = normalize_name(name)
+        if key and key not in visited:
+            never.setdefault(key, name)
+    return [{"name": name, "last_visit": None} for name in sorted(never.values())] + \
+           [{"name": row[0], "last_visit": row[1]} for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Visit rollups: rebuild or print a summary")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--rebuild", action="store_true", help="recompute every rollup from visit_history")
+    parser.add_argument("--force", action="store_true", help="rebuild even if pruned visits would be lost")
+    parser.add_argument("--days", type=int, default=30, help="summary window when not rebuilding")
+    args = parser.parse_args()
+
+    from migrations import migrate
+
+    connection = sqlite3.connect(args.db)
+    migrate(connection)
+    if args.rebuild:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            people = rebuild(connection, force=args.force)
+        except ValueError as e:
+            connection.rollback()
+            sys.exit(f"Not rebuilding: {e}")
+        connection.commit()
+        print(f"Rebuilt visit rollups for {people} people")
+    else:
+        today = date.today()
+        for person in everyone_summary(connection, today - timedelta(days=args.days - 1), today):
+            print(f"{person['name']}: {person['visits']} visits, {person['dwell_seconds'] // 60} min")
+    connection.close()
@@ -0,0 +1,124 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+
+import visit_rollups
+from people import normalize_name
+
+
+class VisitSessionizer:
+    """Turn per-frame recognitions into visits and write them to the database in batches.
+
+    A visit opens when a known person first appears, is extended while they stay
+    in view, and closes once they have been absent for absence_timeout seconds.
+    A background thread flushes arrivals (known_people.last_visit) and closed
+    visits (visit_history with arrival time and dwell duration, and the visit
+    rollups) every flush_interval seconds, each flush in a single transaction.
+    Visits are keyed by people.normalize_name, so "Jilu Elsa Jacob" and
+    "jilu  elsa jacob" are one visit and one known_people row.
+    on_arrival(name, when) runs whenever a visit opens.
+    """
+
+    def __init__(self, db, absence_timeout=120.0, flush_interval=15.0, on_arrival=None):
+        self.db = db  # db.Database
+        self.on_arrival = on_arrival
+        self.absence_timeout = absence_timeout
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.open_visits = {}   # normalized name -> {"name": str, "arrival": datetime, "last_seen": datetime}
+        self.arrivals = []      # (name, datetime) not yet written to known_people
+        self.closed = []        # (name, arrival, duration_seconds) not yet written to visit_history
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="visit-sessionizer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def observe(self, names, now=None):
+        """Record that these known people are in view right now (called every frame)."""
+        now = now or datetime.now()
+        arrived = []
+        with self.lock:
+            for name in names:
+                key = normalize_name(name)
+                if not key or name == "Unknown":
+                    continue
+                visit = self.open_visits.get(key)
+                if visit is None:
+                    name = " ".join(name.split())
+                    self.open_visits[key] = {"name": name, "arrival": now, "last_seen": now}
+                    self.arrivals.append((name, now))
+                    arrived.append(name)
+                else:
+                    visit["last_seen"] = now
+        if self.on_arrival is not None:
+            for name in arrived:
+                self.on_arrival(name, now)
+
+    def current_visits(self, now=None):
+        """Open visits as (name, arrival, dwell_seconds)."""
+        now = now or datetime.now()
+        with self.lock:
+            return [(visit["name"], visit["arrival"], (now - visit["arrival"]).total_seconds())
+                    for visit in self.open_visits.values()]
+
+    def close_stale(self, now=None, close_all=False):
+        """Close visits whose person has been absent longer than absence_timeout."""
+        now = now or datetime.now()
+        with self.lock:
+            for key, visit in list(self.open_visits.items()):
+                if close_all or (now - visit["last_seen"]).total_seconds() > self.absence_timeout:
+                    duration = (visit["last_seen"] - visit["arrival"]).total_seconds()
+                    self.closed.append((visit["name"], visit["arrival"], duration))
+                    del self.open_visits[key]
+
+    def flush(self):
+        """Write pending arrivals and closed visits in one transaction."""
+        with self.lock:
+            arrivals, self.arrivals = self.arrivals, []
+            closed, self.closed = self.closed, []
+        if not arrivals and not closed:
+            return
+
+        fmt = "%Y-%m-%d %H:%M:%S"
+        conn = None
+        try:
+            conn = self.db.connect()
+            with conn:
+                if arrivals:
+                    # Case-insensitive, as in PeopleRegistry.upsert, so an enrolled person is never duplicated
+                    rows = [(name, when.strftime(fmt), name.lower()) for name, when in arrivals]
+                    conn.executemany('''
+                        INSERT INTO known_people (name, relation, last_visit)
+                        SELECT ?, 'Unknown', ? WHERE NOT EXISTS (SELECT 1 FROM known_people WHERE LOWER(name) = ?)
+                    ''', rows)
+                    conn.executemany("UPDATE known_people SET last_visit=? WHERE LOWER(name)=?",
+                                     [(when.strftime(fmt), name.lower()) for name, when in arrivals])
+                if closed:
+                    visits = [(name, arrival.strftime(fmt), int(duration)) for name, arrival, duration in closed]
+                    conn.executemany('''
+                        INSERT INTO visit_history (person_name, visit_date, duration_seconds)
+                        VALUES (?, ?, ?)
+                    ''', visits)
+                    visit_rollups.record(conn, visits)
+        except Exception as e:
+            print(f"Error saving visits: {e}")
+            # Put them back so the next flush retries
+            with self.lock:
+                self.arrivals = arrivals + self.arrivals
+                self.closed = closed + self.closed
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            self.close_stale()
+            self.flush()
+
+    def close(self):
+        """Close every open visit and flush (on shutdown)."""
+        self.running = False
+        self.close_stale(close_all=True)
+        self.flush()